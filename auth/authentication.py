@@ -7,6 +7,9 @@ from db.database import get_db  # Funktion zur Bereitstellung der Datenbankverbi
 from fastapi.exceptions import HTTPException  # Ausnahmebehandlung für HTTP-spezifische Fehler
 from db.hash import Hash  # Importieren von Funktionen zum Hashing und Verifizieren von Passwörtern
 from auth import oauth2  # Importieren des Authentifizierungsmoduls für OAuth2
+from db import db_user  # Benutzerfunktionen (Aktualisieren des Passwort-Hashes)
+from db.writer import write_queue  # Serialisierte Schreibwarteschlange
+from auth import user_cache  # Cache der Benutzer (nach dem Rehash ungültig machen)
 
 # Erstellen eines Routers für API-Endpunkte im Zusammenhang mit der Authentifizierung
 router = APIRouter(tags=["authentication"])
@@ -39,10 +42,17 @@ def get_token(request: OAuth2PasswordRequestForm = Depends(), db: Session = Depe
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="invalid credentials")
 
-    # Verifizieren des Passworts
-    if not Hash.verify(user.password, request.password):
+    # Verifizieren des Passworts (liefert bei veralteten Hash-Parametern gleich einen neuen Hash)
+    valid, new_hash = Hash.verify_and_update(user.password, request.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="invalid password")
 
+    # Veralteten Hash transparent ersetzen
+    if new_hash:
+        user_id = user.id
+        write_queue.run(lambda write_db: db_user.set_password_hash(write_db, user_id, new_hash))
+        user_cache.invalidate_user(user_id)
+
     # Erstellen eines Access-Tokens mit dem Benutzernamen als Payload
     access_token = oauth2.create_access_token(data={"sub": request.username})
 
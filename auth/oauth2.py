@@ -11,6 +11,8 @@ import schemas  # Import von Schemata, die zur Datenvalidierung verwendet werden
 from jose import JWTError, jwt  # Import von JWT für die Erstellung und Verifizierung von Tokens
 from typing import Optional  # Doppelt importiert, könnte entfernt werden
 from db import models  # Import der Datenbankmodelle
+from auth import user_cache  # Cache für verifizierte Tokens und aufgelöste Benutzer
+import time  # Import für den Vergleich mit der Ablaufzeit des Tokens
 
 # OAuth2PasswordBearer ist ein klassischer Flow für die Authentifizierung mit Bearer-Token. "tokenUrl" ist die URL, an der Benutzer ein Token erhalten.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -78,19 +80,31 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     """
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                           detail="Could not validate credentials")  # Ausnahme, wenn die Anmeldeinformationen ungültig sind
-    try:
-        # Dekodiert das Token und extrahiert den Benutzernamen
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")  # Extrahiert den Benutzernamen aus dem Payload
-        if username is None:  # Wenn kein Benutzername im Token vorhanden ist
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)  # Erstellt ein TokenData-Schema
-    except JWTError:
-        raise credentials_exception  # Wirft eine Ausnahme, wenn der Token ungültig ist
 
-    # Sucht den Benutzer in der Datenbank anhand des Benutzernamens
-    user = db.query(models.DbUser).filter(models.DbUser.username == token_data.username).first()
-    if user is None:  # Wenn der Benutzer nicht gefunden wird
-        raise credentials_exception
+    # Bereits verifizierte Tokens werden bis zu ihrem Ablauf nicht erneut dekodiert
+    cached_token = user_cache.verified_tokens.get(token)
+    if cached_token is not None and cached_token[1] > time.time():
+        username = cached_token[0]
+    else:
+        try:
+            # Dekodiert das Token und extrahiert den Benutzernamen
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")  # Extrahiert den Benutzernamen aus dem Payload
+            if username is None:  # Wenn kein Benutzername im Token vorhanden ist
+                raise credentials_exception
+            token_data = schemas.TokenData(username=username)  # Erstellt ein TokenData-Schema
+        except JWTError:
+            raise credentials_exception  # Wirft eine Ausnahme, wenn der Token ungültig ist
+        username = token_data.username
+        user_cache.verified_tokens[token] = (username, payload.get("exp", 0))
+
+    # Zuerst im Cache nachsehen, sonst den Benutzer in der Datenbank anhand des Benutzernamens suchen
+    user = user_cache.users.get(username)
+    if user is None:
+        user = db.query(models.DbUser).filter(models.DbUser.username == username).first()
+        if user is None:  # Wenn der Benutzer nicht gefunden wird
+            raise credentials_exception
+        db.expunge(user)  # Vom Request-Session lösen, damit das Objekt zwischengespeichert werden kann
+        user_cache.users[username] = user
 
     return user  # Gibt den Benutzer zurück
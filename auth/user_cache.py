@@ -0,0 +1,34 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from expiringdict import ExpiringDict
+
+# Umgebungsvariablen laden
+load_dotenv()
+
+# Sekunden, die ein aufgelöster Benutzer im Cache bleibt (begrenzt veraltete Daten bei mehreren Workern)
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+# Maximale Anzahl gecachter Benutzer bzw. geprüfter Tokens pro Worker
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+
+# Bereits verifizierte Tokens: Token -> (Benutzername, Ablaufzeitpunkt als Unix-Zeit)
+verified_tokens = ExpiringDict(max_len=USER_CACHE_MAX_ENTRIES, max_age_seconds=24 * 60 * 60)
+
+# Aufgelöste Benutzer: Benutzername -> von der Sitzung gelöstes DbUser-Objekt
+users = ExpiringDict(max_len=USER_CACHE_MAX_ENTRIES, max_age_seconds=USER_CACHE_TTL)
+
+_lock = threading.Lock()
+
+
+def invalidate_user(user_id: int):
+    """
+    Entfernt einen Benutzer aus dem Cache (nach Änderung oder Löschung).
+
+    Parameter:
+    - user_id (int): Die ID des geänderten bzw. gelöschten Benutzers.
+    """
+    with _lock:
+        for username, user in list(users.items()):
+            if user.id == user_id:
+                users.pop(username, None)
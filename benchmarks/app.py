@@ -0,0 +1,24 @@
+"""ASGI entry point for load tests: the real app, with OCR optionally replaced by a stub.
+
+``BENCH_STUB_OCR=1`` swaps Tesseract for a fixed text returned after
+``BENCH_OCR_LATENCY`` seconds; everything else (caches, GPT calls, database)
+runs unchanged. Start with ``uvicorn benchmarks.app:app``.
+"""
+import asyncio
+import os
+
+import main
+from benchmarks.fake_openai import DEFAULT_FIXTURES, load_fixtures
+from services import ocr
+
+if os.getenv("BENCH_STUB_OCR") == "1":
+    OCR_LATENCY = float(os.getenv("BENCH_OCR_LATENCY", 0.05))
+    OCR_TEXT = load_fixtures(os.getenv("BENCH_FIXTURES", DEFAULT_FIXTURES))["ocr_text"]
+
+    async def stub_extract_text(data: bytes, filename: str) -> str:
+        await asyncio.sleep(OCR_LATENCY)
+        return OCR_TEXT
+
+    ocr.extract_text = stub_extract_text
+
+app = main.app
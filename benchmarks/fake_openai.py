@@ -0,0 +1,104 @@
+"""Local stand-in for the OpenAI API (chat completions, streaming, Whisper).
+
+Answers come from a fixtures file and are delayed by a configurable latency,
+so the service can be load tested without API keys or costs::
+
+    python -m benchmarks.fake_openai --port 8765 --latency 0.8 --jitter 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from aiohttp import web
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures.json")
+
+
+def load_fixtures(path: str = DEFAULT_FIXTURES) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeOpenAI:
+    def __init__(self, fixtures: dict, latency: float, jitter: float, chunk_delay: float):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_delay = chunk_delay
+        self.calls = {"chat": 0, "chat_stream": 0, "transcriptions": 0}
+
+    async def _wait(self):
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def _chat_content(self, messages: list) -> str:
+        """The first fixture whose ``match`` occurs in the prompt wins ("" matches everything)."""
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        for fixture in self.fixtures["chat"]:
+            if fixture["match"] in prompt:
+                return fixture["content"]
+        return "{}"
+
+    async def chat(self, request: web.Request):
+        body = await request.json()
+        content = self._chat_content(body.get("messages", []))
+        created = int(time.time())
+
+        if not body.get("stream"):
+            self.calls["chat"] += 1
+            await self._wait()
+            return web.json_response({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        self.calls["chat_stream"] += 1
+        await self._wait()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for start in range(0, len(content), 4):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                     "model": body.get("model"),
+                     "choices": [{"index": 0, "delta": {"content": content[start:start + 4]}, "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self.chunk_delay)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def transcriptions(self, request: web.Request):
+        self.calls["transcriptions"] += 1
+        await request.post()
+        await self._wait()
+        return web.json_response({"text": self.fixtures["transcript"]})
+
+    async def stats(self, request: web.Request):
+        return web.json_response(self.calls)
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post("/v1/chat/completions", self.chat)
+        app.router.add_post("/v1/audio/transcriptions", self.transcriptions)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds until a response starts")
+    parser.add_argument("--jitter", type=float, default=0.1, help="random +/- seconds added to the latency")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(load_fixtures(args.fixtures), args.latency, args.jitter, args.chunk_delay)
+    web.run_app(fake.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""OCR time (and accuracy) per page with and without image preprocessing.
+
+Runs Tesseract in this process on sample forms (images or PDFs), once on the
+raw page images and once after services.ocr_preprocess, and reports the
+seconds per page of both runs::
+
+    python -m benchmarks.ocr_preprocess samples/
+    python -m benchmarks.ocr_preprocess scan1.jpg form.pdf --repeat 3 --json ocr.json
+    python -m benchmarks.ocr_preprocess samples/ --engine pytesseract
+
+A ``<name>.txt`` next to a sample is taken as its expected text; the report then
+also shows the similarity of the recognized text to it. Without samples, a few
+synthetic form photos (large, rotated, noisy) are generated. Needs the
+tesseract binary (and poppler for PDFs).
+"""
+import argparse
+import difflib
+import io
+import json
+import os
+import random
+import statistics
+import time
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from services import ocr, ocr_engine, ocr_preprocess
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+SYNTHETIC_LINES = [
+    "Testo Inspektionsprotokoll",
+    "Inspection Location: Berlin Halle 3",
+    "Device Type: Testo 557s",
+    "Device Number: 4711-0815",
+    "Kaeltepumpe: 42.5",
+    "Inspection Date: 2024-05-17",
+    "Pruefer: M. Mustermann",
+    "Additional Info: Filter gereinigt, Dichtheit geprueft",
+]
+
+
+def synthetic_samples(count: int = 3) -> list:
+    """Phone-photo-like form pages: 12 MP, a few degrees rotated, grey paper with noise."""
+    rng = random.Random(0)
+    try:
+        font = ImageFont.load_default(size=64)
+    except TypeError:  # Pillow < 10.1 has only the small bitmap font
+        font = ImageFont.load_default()
+    samples = []
+    for index in range(count):
+        page = Image.new("L", (2480, 3508), 255)
+        draw = ImageDraw.Draw(page)
+        for line, text in enumerate(SYNTHETIC_LINES):
+            draw.text((250, 300 + line * 140), text, fill=0, font=font)
+        angle = rng.uniform(-4, 4)
+        photo = page.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+        photo = photo.resize((3024, 4032)).point(lambda value: value * 0.85 + 20)
+        noise = Image.effect_noise(photo.size, 18)
+        photo = Image.blend(photo, noise, 0.15).filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        photo.convert("RGB").save(buffer, "JPEG", quality=85)
+        samples.append((f"synthetic-{index + 1} ({angle:+.1f}°)", buffer.getvalue(), ".jpg", "\n".join(SYNTHETIC_LINES)))
+    return samples
+
+
+def load_samples(paths: list) -> list:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)))
+        else:
+            files.append(path)
+    samples = []
+    for path in files:
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in IMAGE_EXTENSIONS + (".pdf",):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        expected = None
+        truth = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(truth):
+            with open(truth, encoding="utf-8") as f:
+                expected = f.read()
+        samples.append((os.path.basename(path), data, extension, expected))
+    return samples
+
+
+def page_images(data: bytes, extension: str):
+    """Fresh (unloaded) page images; every run must start from the same input."""
+    if extension == ".pdf":
+        from pdf2image import convert_from_bytes
+        return convert_from_bytes(data, dpi=ocr.PDF_DPI)
+    return [Image.open(io.BytesIO(data))]
+
+
+def similarity(text: str, expected: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(text.split()), " ".join(expected.split())).ratio()
+
+
+def run_sample(data: bytes, extension: str, expected, preprocess: bool, repeat: int) -> dict:
+    ocr_preprocess.OCR_PREPROCESS = preprocess
+    durations, text, pages = [], "", 0
+    for _ in range(repeat):
+        images = page_images(data, extension)
+        timings = {}
+        started = time.perf_counter()
+        text = "\n".join(ocr._recognize(image, timings) for image in images)
+        pages = len(images)
+        durations.append((time.perf_counter() - started) / pages)
+    result = {"seconds_per_page": statistics.median(durations), "pages": pages,
+              "preprocess_seconds": timings.get("ocr_preprocess", 0) / pages,
+              "tesseract_seconds": timings.get("tesseract", 0) / pages}
+    if expected is not None:
+        result["similarity"] = similarity(text, expected)
+    return result
+
+
+def print_report(results: dict):
+    print(f"{'sample':<32} {'pages':>5} {'raw s/page':>11} {'prep s/page':>12} {'speedup':>8} {'raw acc':>8} {'prep acc':>9}")
+    for name, result in results.items():
+        raw, prepared = result["raw"], result["preprocessed"]
+        speedup = raw["seconds_per_page"] / prepared["seconds_per_page"] if prepared["seconds_per_page"] else 0
+        accuracy = [f"{run['similarity']:.1%}" if "similarity" in run else "-" for run in (raw, prepared)]
+        print(f"{name[:32]:<32} {raw['pages']:>5} {raw['seconds_per_page']:>11.2f} "
+              f"{prepared['seconds_per_page']:>12.2f} {speedup:>7.2f}x {accuracy[0]:>8} {accuracy[1]:>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("samples", nargs="*", help="images, PDFs or directories (default: synthetic photos)")
+    parser.add_argument("--engine", default=ocr_engine.OCR_ENGINE, help="auto, tesserocr or pytesseract")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per sample and mode (the median counts)")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    samples = load_samples(args.samples) if args.samples else synthetic_samples()
+    if not samples:
+        raise SystemExit("no images or PDFs found")
+
+    ocr._engine = ocr_engine.create(ocr.OCR_LANG, ocr.OCR_PSM, args.engine)
+    enabled = ocr_preprocess.OCR_PREPROCESS
+    results = {}
+    try:
+        for name, data, extension, expected in samples:
+            results[name] = {"raw": run_sample(data, extension, expected, False, args.repeat),
+                             "preprocessed": run_sample(data, extension, expected, True, args.repeat)}
+    finally:
+        ocr_preprocess.OCR_PREPROCESS = enabled
+
+    print(f"engine={ocr._engine.name} psm={ocr.OCR_PSM or 'default'} lang={ocr.OCR_LANG} {ocr_preprocess.settings()}")
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""End-to-end load benchmark against local stand-ins for OpenAI and (optionally) Tesseract.
+
+Starts the fake OpenAI server and the app (uvicorn, on a copy of the database),
+drives the selected endpoints at a fixed concurrency and reports latency
+percentiles, throughput and server memory::
+
+    python -m benchmarks.run --concurrency 32 --requests 500 --stub-ocr
+    python -m benchmarks.run --scenarios token,save_inspection --json result.json
+    python -m benchmarks.run --baseline result.json --max-regression 0.2
+
+With ``--baseline`` the run fails (exit code 1) if a scenario's p95 latency or
+throughput got worse than the allowed fraction.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import wave
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["token", "login", "save_inspection", "process_form", "process_voice"]
+BENCH_USER = {"username": "bench", "email": "bench@example.com", "password": "bench-password"}
+
+
+# --- payloads ---
+
+def make_form_image() -> bytes:
+    """A small form-like PNG, so real OCR has something to read when it is not stubbed."""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        # Enough for the OCR stub, which never looks at the content
+        return b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+    image = Image.new("L", (1240, 400), 255)
+    draw = ImageDraw.Draw(image)
+    for row, label in enumerate(["Device Name:", "Inspection Location:", "Inspection Date:", "Kältepumpe:"]):
+        draw.text((60, 60 + row * 80), label + " ____________________", fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_wav(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+# --- memory of the server process ---
+
+def _proc_children(pid: int) -> list:
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return children + [grandchild for child in children for grandchild in _proc_children(child)]
+
+
+def rss_bytes(pid: int):
+    """Resident memory of the server and its children (OCR pool), or None if it cannot be measured."""
+    try:
+        import psutil
+
+        process = psutil.Process(pid)
+        return sum(p.memory_info().rss for p in [process] + process.children(recursive=True))
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    total = 0
+    for process_id in [pid] + _proc_children(pid):
+        try:
+            with open(f"/proc/{process_id}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total or None
+
+
+class MemorySampler:
+    def __init__(self, pid, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._task = None
+
+    async def _run(self):
+        while True:
+            rss = rss_bytes(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        if self.pid is not None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        if self._task is not None:
+            self._task.cancel()
+
+
+# --- processes ---
+
+def wait_for_http(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout} seconds")
+
+
+def start_fake_openai(args) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(args.openai_port),
+         "--latency", str(args.openai_latency), "--jitter", str(args.openai_jitter),
+         "--chunk-delay", str(args.openai_chunk_delay), "--fixtures", args.fixtures],
+        cwd=ROOT)
+    wait_for_http(f"http://127.0.0.1:{args.openai_port}/stats")
+    return process
+
+
+def start_server(args, workdir: str) -> subprocess.Popen:
+    """Run the app from a scratch directory with a copy of the database and a link to the templates."""
+    shutil.copy(args.database, os.path.join(workdir, "testoSample.db"))
+    os.symlink(os.path.join(ROOT, "templates"), os.path.join(workdir, "templates"))
+    env = dict(os.environ,
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               OPENAI_API_KEY="bench", OPENAI_API_BASE=f"http://127.0.0.1:{args.openai_port}/v1",
+               BENCH_STUB_OCR="1" if args.stub_ocr else "0", BENCH_OCR_LATENCY=str(args.ocr_latency),
+               BENCH_FIXTURES=args.fixtures)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.app:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL if args.quiet else None)
+    wait_for_http(f"http://127.0.0.1:{args.port}/login")
+    return process
+
+
+# --- load ---
+
+def percentile(sorted_values: list, fraction: float):
+    if not sorted_values:
+        return None
+    # Nearest-rank method
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def milliseconds(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class Benchmark:
+    def __init__(self, args, client: httpx.AsyncClient):
+        self.args = args
+        self.client = client
+        self.user_id = None
+        self.form_image = make_form_image()
+        self.wav = make_wav()
+        self.no_cache = {"no_cache": "true"} if args.no_cache else {}
+
+    async def setup(self):
+        await self.client.post("/signup/submit", data=BENCH_USER)
+        response = await self.client.post("/token", data={"username": BENCH_USER["username"],
+                                                          "password": BENCH_USER["password"]})
+        response.raise_for_status()
+        self.user_id = response.json()["userID"]
+
+    def _upload(self, data: bytes) -> bytes:
+        # Trailing bytes after the image end make every upload distinct without breaking decoding
+        return data + uuid.uuid4().bytes if self.args.unique_uploads else data
+
+    async def request(self, scenario: str) -> httpx.Response:
+        credentials = {"username": BENCH_USER["username"], "password": BENCH_USER["password"]}
+        if scenario == "token":
+            return await self.client.post("/token", data=credentials)
+        if scenario == "login":
+            return await self.client.post("/login", data=credentials)
+        if scenario == "save_inspection":
+            return await self.client.post("/api/save_inspection", json={
+                "data": {"Device Name": "Testo 550", "Inspection Location": "Berlin", "Kältepumpe": "33",
+                         "Inspection Details": "benchmark"},
+                "user_id": self.user_id})
+        if scenario == "process_form":
+            return await self.client.post("/process_form", params=self.no_cache,
+                                          files={"file": ("form.png", self._upload(self.form_image), "image/png")})
+        if scenario == "process_voice":
+            return await self.client.post("/process_voice", params=self.no_cache,
+                                          files={"audio": ("audio.wav", self._upload(self.wav), "audio/wav")},
+                                          data={"extracted_fields": json.dumps(["Device Name", "Inspection Location"])})
+        raise ValueError(scenario)
+
+    async def run_scenario(self, scenario: str, server_pid) -> dict:
+        for _ in range(self.args.warmup):
+            await self.request(scenario)
+
+        latencies, errors = [], 0
+        remaining = self.args.requests
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await self.request(scenario)
+                    ok = response.status_code < 400 and "error" not in response.text[:200]
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        with MemorySampler(server_pid) as memory:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": len(latencies) / elapsed if elapsed else None,
+            "p50_ms": milliseconds(percentile(latencies, 0.50)),
+            "p95_ms": milliseconds(percentile(latencies, 0.95)),
+            "p99_ms": milliseconds(percentile(latencies, 0.99)),
+            "max_ms": milliseconds(percentile(latencies, 1.0)),
+            "peak_rss_mb": memory.peak / 2 ** 20 if memory.peak else None,
+        }
+
+
+def print_report(results: dict):
+    columns = ["requests", "errors", "throughput", "p50_ms", "p95_ms", "p99_ms", "max_ms", "peak_rss_mb"]
+    print("\n" + "scenario".ljust(16) + "".join(name.rjust(12) for name in columns))
+    for scenario, result in results.items():
+        cells = []
+        for name in columns:
+            value = result[name]
+            cells.append(("-" if value is None else f"{value:.1f}" if isinstance(value, float) else str(value)).rjust(12))
+        print(scenario.ljust(16) + "".join(cells))
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Scenarios whose p95 latency rose or throughput fell by more than ``max_regression``."""
+    regressions = []
+    for scenario, result in results.items():
+        before = baseline.get("results", {}).get(scenario)
+        if not before:
+            continue
+        if result["requests"] == 0:
+            if before.get("requests"):
+                regressions.append(f"{scenario}: no requests completed")
+            continue
+        if before.get("p95_ms") is not None and result["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{scenario}: p95 {before['p95_ms']:.1f} ms -> {result['p95_ms']:.1f} ms")
+        if before.get("throughput") is not None and result["throughput"] < before["throughput"] * (1 - max_regression):
+            regressions.append(f"{scenario}: throughput {before['throughput']:.1f}/s -> {result['throughput']:.1f}/s")
+    return regressions
+
+
+async def run(args, server_pid) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.server_url, limits=limits, timeout=args.timeout) as client:
+        benchmark = Benchmark(args, client)
+        await benchmark.setup()
+        results = {}
+        for scenario in args.scenarios:
+            print(f"running {scenario} ({args.requests} requests, concurrency {args.concurrency})", flush=True)
+            results[scenario] = await benchmark.run_scenario(scenario, server_pid)
+        return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [name for name in value.split(",") if name])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--no-cache", action="store_true", help="send no_cache=true to the AI endpoints")
+    parser.add_argument("--unique-uploads", action="store_true", help="make every upload distinct (defeats caches)")
+    parser.add_argument("--stub-ocr", action="store_true", help="replace Tesseract by a fixed text")
+    parser.add_argument("--ocr-latency", type=float, default=0.05, help="seconds the OCR stub takes")
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--openai-jitter", type=float, default=0.1)
+    parser.add_argument("--openai-chunk-delay", type=float, default=0.01)
+    parser.add_argument("--openai-port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=os.path.join(ROOT, "benchmarks", "fixtures.json"))
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--database", default=os.path.join(ROOT, "testoSample.db"),
+                        help="database the scratch copy is made from")
+    parser.add_argument("--server-url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--quiet", action="store_true", help="hide the server's output")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    processes, workdir, server_pid = [], None, None
+    try:
+        if args.server_url is None:
+            workdir = tempfile.mkdtemp(prefix="bench-")
+            processes.append(start_fake_openai(args))
+            server = start_server(args, workdir)
+            processes.append(server)
+            server_pid = server.pid
+            args.server_url = f"http://127.0.0.1:{args.port}"
+        results = asyncio.run(run(args, server_pid))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=30)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    settings = {name: value for name, value in vars(args).items() if name not in ("json", "baseline")}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,60 @@
-from sqlalchemy import create_engine
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+# Umgebungsvariablen laden
+load_dotenv()
+
+# Speicherprofile: "default" lässt SQLite unverändert, "wal" aktiviert WAL mit angepassten PRAGMAs
+STORAGE_PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",      # Leser blockieren Schreiber nicht mehr (und umgekehrt)
+        "synchronous": "NORMAL",    # fsync nur beim Checkpoint, im WAL-Modus trotzdem absturzsicher
+        "busy_timeout": 5000,       # Millisekunden warten statt sofort "database is locked"
+        "cache_size": -65536,       # 64 MB Seiten-Cache pro Verbindung
+        "mmap_size": 268435456,     # 256 MB der Datenbank per mmap lesen
+        "temp_store": "MEMORY",
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "wal")
+
+# Einzelne PRAGMAs lassen sich per Umgebungsvariable überschreiben (z. B. DB_BUSY_TIMEOUT=10000)
+SQLITE_PRAGMAS = dict(STORAGE_PROFILES[DB_PROFILE])
+for _name in ("synchronous", "busy_timeout", "cache_size", "mmap_size"):
+    if os.getenv(f"DB_{_name.upper()}"):
+        SQLITE_PRAGMAS[_name] = os.getenv(f"DB_{_name.upper()}")
+
 # Datenbank-Engine erstellen
 engine = create_engine("sqlite:///testoSample.db", connect_args={"check_same_thread": False})
 
+# Asynchrone Engine (aiosqlite) auf dieselbe Datenbank für async Routen
+async_engine = create_async_engine("sqlite+aiosqlite:///testoSample.db")
+
+
+# PRAGMAs des Speicherprofils auf jede neue Verbindung anwenden (synchron und asynchron)
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
 # Basisklasse für Modelle
 Base = declarative_base()
 
 # Session-Maker erstellen
 sessionLocal = sessionmaker(bind=engine)
 
+# Asynchronen Session-Maker erstellen (Objekte bleiben nach dem Commit lesbar)
+asyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
 # Datenbank-Sitzung bereitstellen
 def get_db():
     db = sessionLocal()
@@ -18,3 +62,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Asynchrone Datenbank-Sitzung bereitstellen (für async def Routen)
+async def get_async_db():
+    async with asyncSessionLocal() as db:
+        yield db
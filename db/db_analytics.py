@@ -0,0 +1,178 @@
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm.session import Session
+
+from db.models import DeviceInspection, InspectionSummary
+
+# Die Felder in "data" stammen frei formuliert aus GPT; diese (normalisierten) Schlüssel werden je Auswertung erkannt
+DEVICE_KEYS = {"device name", "device", "devicename", "testodevice", "gerät", "gerätename", "gerätname", "messgerät"}
+LOCATION_KEYS = {"inspection location", "location", "inspektionsort", "ort", "standort"}
+DATE_KEYS = {"inspection date", "inspection datum", "inspectiondatum", "inspektionsdatum", "date of inspection",
+             "datum", "date"}
+KAELTEPUMP_KEYS = {"kältepump", "kältepumpe", "kältpump", "kaeltepump", "kaeltepumpe"}
+
+DIMENSIONS = ("total", "device", "location", "month")
+
+# Monatsnamen (deutsch und englisch, auch abgekürzt) für Datumsangaben wie "5. Februar 2019"
+MONTHS = {
+    "jan": 1, "feb": 2, "mär": 3, "mar": 3, "apr": 4, "mai": 5, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "okt": 10, "oct": 10, "nov": 11, "dez": 12, "dec": 12,
+}
+
+# Zeilen pro Abfrage beim Neuaufbau
+REBUILD_BATCH_SIZE = 1000
+
+
+# Schlüssel vereinheitlichen: "- Inspection_Location:" -> "inspection location"
+def _normalize_key(key: str) -> str:
+    return re.sub(r"[\s_]+", " ", key.strip().strip("-\"': ").lower())
+
+
+# Wert vereinheitlichen: Anführungszeichen entfernen, "berlin" und "BERLIN" zu "Berlin"
+def _normalize_value(value) -> str:
+    text = re.sub(r"\s+", " ", str(value)).strip().strip("\"',").strip()
+    if text.islower() or text.isupper():
+        text = text.title()
+    return text
+
+
+# Ersten Wert zu einem der Schlüssel aus "keys" suchen
+def _find_value(fields: dict, keys: set):
+    for key, value in fields.items():
+        if value not in (None, "", "null") and _normalize_key(str(key)) in keys:
+            return value
+    return None
+
+
+# Zahl aus einem Wert wie "55", "3,5" oder "33 Stück" lesen
+def _parse_number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = re.search(r"-?\d+(?:[.,]\d+)?", str(value))
+    return float(match.group().replace(",", ".")) if match else None
+
+
+# Monat ("YYYY-MM") aus Datumsangaben wie "11.11.2021", "2021-11-11", "5. Februar 2019" oder "February 11, 1999"
+def _parse_month(value):
+    text = str(value).lower()
+    match = re.search(r"\b(\d{1,2})\.\s*(\d{1,2})\.\s*(\d{4})\b", text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return f"{match.group(3)}-{int(match.group(2)):02d}"
+    match = re.search(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b", text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return f"{match.group(1)}-{int(match.group(2)):02d}"
+    year = re.search(r"\b(\d{4})\b", text)
+    for word in re.findall(r"[a-zäöü]{3,}", text):
+        if word[:3] in MONTHS and year:
+            return f"{year.group(1)}-{MONTHS[word[:3]]:02d}"
+    return None
+
+
+# Gruppen (Dimension, Schlüssel) und Kältepumpen-Wert einer Inspektion bestimmen
+# Monat: Inspektionsdatum aus "data", sonst das Speicherdatum
+def classify_inspection(data, created_at=None):
+    fields = data if isinstance(data, dict) else {}
+    groups = [("total", "")]
+    device = _find_value(fields, DEVICE_KEYS)
+    if device is not None:
+        groups.append(("device", _normalize_value(device)))
+    location = _find_value(fields, LOCATION_KEYS)
+    if location is not None:
+        groups.append(("location", _normalize_value(location)))
+    inspection_date = _find_value(fields, DATE_KEYS)
+    month = _parse_month(inspection_date) if inspection_date is not None else None
+    if month is None and created_at is not None:
+        month = created_at.strftime("%Y-%m")
+    if month is not None:
+        groups.append(("month", month))
+    kaeltepump = _find_value(fields, KAELTEPUMP_KEYS)
+    return groups, (_parse_number(kaeltepump) if kaeltepump is not None else None)
+
+
+# Änderungen je Gruppe aus mehreren Inspektionen zusammenfassen (eine Zeile je Gruppe)
+def _summary_deltas(inspections):
+    deltas = {}
+    for data, created_at in inspections:
+        groups, kaeltepump = classify_inspection(data, created_at)
+        for dimension, key in groups:
+            delta = deltas.setdefault((dimension, key), {
+                "dimension": dimension, "key": key, "inspections": 0, "kaeltepump_count": 0,
+                "kaeltepump_sum": 0.0, "kaeltepump_min": None, "kaeltepump_max": None})
+            delta["inspections"] += 1
+            if kaeltepump is not None:
+                delta["kaeltepump_count"] += 1
+                delta["kaeltepump_sum"] += kaeltepump
+                if delta["kaeltepump_min"] is None or kaeltepump < delta["kaeltepump_min"]:
+                    delta["kaeltepump_min"] = kaeltepump
+                if delta["kaeltepump_max"] is None or kaeltepump > delta["kaeltepump_max"]:
+                    delta["kaeltepump_max"] = kaeltepump
+    return list(deltas.values())
+
+
+# Funktion zum Fortschreiben der Auswertungen für neu gespeicherte Inspektionen (ohne Commit)
+# Wird von db_device in derselben Transaktion wie das Insert aufgerufen; ein Upsert je betroffener Gruppe
+def add_to_inspection_summaries(db: Session, inspections_data: list):
+    now = datetime.utcnow()
+    deltas = _summary_deltas((row.get("data"), row.get("created_at", now)) for row in inspections_data)
+    if not deltas:
+        return
+    statement = insert(InspectionSummary)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[InspectionSummary.dimension, InspectionSummary.key],
+        set_={
+            "inspections": InspectionSummary.inspections + excluded.inspections,
+            "kaeltepump_count": InspectionSummary.kaeltepump_count + excluded.kaeltepump_count,
+            "kaeltepump_sum": InspectionSummary.kaeltepump_sum + excluded.kaeltepump_sum,
+            # min()/max() mit NULL ergeben in SQLite NULL, daher beide Seiten mit coalesce absichern
+            "kaeltepump_min": func.min(func.coalesce(InspectionSummary.kaeltepump_min, excluded.kaeltepump_min),
+                                       func.coalesce(excluded.kaeltepump_min, InspectionSummary.kaeltepump_min)),
+            "kaeltepump_max": func.max(func.coalesce(InspectionSummary.kaeltepump_max, excluded.kaeltepump_max),
+                                       func.coalesce(excluded.kaeltepump_max, InspectionSummary.kaeltepump_max)),
+        })
+    db.execute(statement, deltas)
+
+
+# Funktion zum vollständigen Neuaufbau der Auswertungen aus allen Inspektionen (in einer Transaktion)
+def rebuild_inspection_summaries(db: Session):
+    db.query(InspectionSummary).delete()
+    after_id = 0
+    while True:
+        rows = db.execute(select(DeviceInspection.id, DeviceInspection.data, DeviceInspection.created_at)
+                          .where(DeviceInspection.id > after_id)
+                          .order_by(DeviceInspection.id).limit(REBUILD_BATCH_SIZE)).all()
+        if not rows:
+            break
+        add_to_inspection_summaries(db, [{"data": row.data, "created_at": row.created_at} for row in rows])
+        after_id = rows[-1].id
+    db.commit()
+
+
+# Neuaufbau nur, wenn es Inspektionen, aber noch keine Auswertungen gibt (z. B. nach dem Anlegen der Tabelle)
+def ensure_inspection_summaries(db: Session):
+    if db.get(InspectionSummary, ("total", "")) is None and db.query(DeviceInspection.id).first() is not None:
+        rebuild_inspection_summaries(db)
+
+
+# Funktion zum Abrufen der Auswertungen einer Dimension (größte Gruppen zuerst)
+def get_inspection_summaries(db: Session, dimension: str):
+    return db.query(InspectionSummary).filter(InspectionSummary.dimension == dimension) \
+        .order_by(InspectionSummary.inspections.desc(), InspectionSummary.key).all()
+
+
+# Neuaufbau von der Kommandozeile: python -m db.db_analytics rebuild
+if __name__ == "__main__":
+    from db.database import sessionLocal
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m db.db_analytics rebuild")
+    session = sessionLocal()
+    try:
+        rebuild_inspection_summaries(session)
+        print(f"rebuilt {session.query(InspectionSummary).count()} summary rows")
+    finally:
+        session.close()
@@ -1,16 +1,49 @@
+from datetime import datetime, timedelta
+from db import db_analytics
 from db.models import DeviceInspection
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 
 
-# Funktion zum Hinzufügen einer Schiffsinspektion in die Datenbank
+# Funktion zum Hinzufügen einer Schiffsinspektion in die Datenbank (Auswertungen in derselben Transaktion)
 def create_device_inspection(db: Session, inspection_data):
     inspection = DeviceInspection(**inspection_data)
     db.add(inspection)
+    db_analytics.add_to_inspection_summaries(db, [inspection_data])
     db.commit()
     db.refresh(inspection)
     return inspection
 
 
+# Funktion zum Hinzufügen einer Inspektion ohne Commit (für die Schreibwarteschlange), gibt die neue ID zurück
+def add_device_inspection(db: Session, inspection_data):
+    inspection = DeviceInspection(**inspection_data)
+    db.add(inspection)
+    db.flush()
+    db_analytics.add_to_inspection_summaries(db, [inspection_data])
+    return inspection.id
+
+
+# Funktion zum Einfügen vieler Inspektionen mit einem einzigen INSERT (ohne Commit, kein refresh pro Zeile)
+# Gibt die vergebenen IDs in der Reihenfolge der Eingabe zurück
+def add_device_inspections_bulk(db: Session, inspections_data: list):
+    if not inspections_data:
+        return []
+    result = db.execute(insert(DeviceInspection).returning(DeviceInspection.id, sort_by_parameter_order=True),
+                        inspections_data)
+    inspection_ids = list(result.scalars())
+    db_analytics.add_to_inspection_summaries(db, inspections_data)
+    return inspection_ids
+
+
+# Funktion zum Hinzufügen vieler Inspektionen in einer einzigen Transaktion
+def create_device_inspections_bulk(db: Session, inspections_data: list):
+    inspection_ids = add_device_inspections_bulk(db, inspections_data)
+    db.commit()
+    return inspection_ids
+
+
 # Funktion zum Abrufen aller Schiffsinspektionen aus der Datenbank
 def get_all_device_inspections(db):
     return db.query(DeviceInspection).all()
@@ -20,3 +53,63 @@ def get_all_device_inspections(db):
 def get_device_inspection_by_id(db, inspection_id):
     return db.query(DeviceInspection).filter(DeviceInspection.id == inspection_id).first()
 
+
+# Abfrage für eine Seite von Inspektionen (Keyset-Paginierung, neueste zuerst)
+# after_id ist die ID des letzten Eintrags der vorherigen Seite; das Datumsintervall ist inklusiv
+def _device_inspections_page_query(user_id=None, after_id=None, limit=50, date_from=None, date_to=None):
+    query = select(DeviceInspection)
+    if user_id is not None:
+        query = query.where(DeviceInspection.user_id == user_id)
+    if after_id is not None:
+        query = query.where(DeviceInspection.id < after_id)
+    if date_from is not None:
+        query = query.where(DeviceInspection.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to is not None:
+        query = query.where(DeviceInspection.created_at < datetime.combine(date_to + timedelta(days=1),
+                                                                            datetime.min.time()))
+    return query.order_by(DeviceInspection.id.desc()).limit(limit)
+
+
+# Funktion zum seitenweisen Abrufen von Inspektionen
+def get_device_inspections_page(db: Session, user_id=None, after_id=None, limit=50,
+                                date_from=None, date_to=None):
+    return db.execute(_device_inspections_page_query(user_id, after_id, limit, date_from, date_to)).scalars().all()
+
+
+# Funktion zum Abrufen der Rohdaten (id, user_id, created_at, data) ab einer ID, älteste zuerst (für den Export)
+# Liefert Zeilen statt ORM-Objekten, damit große Exporte die Session nicht füllen
+def get_device_inspection_rows(db: Session, user_id=None, after_id=None, limit=1000):
+    query = select(DeviceInspection.id, DeviceInspection.user_id, DeviceInspection.created_at, DeviceInspection.data)
+    if user_id is not None:
+        query = query.where(DeviceInspection.user_id == user_id)
+    if after_id is not None:
+        query = query.where(DeviceInspection.id > after_id)
+    return db.execute(query.order_by(DeviceInspection.id).limit(limit)).all()
+
+
+# --- Asynchrone Varianten (AsyncSession, für async def Routen) ---
+
+# Funktion zum Hinzufügen einer Inspektion (async)
+async def create_device_inspection_async(db: AsyncSession, inspection_data):
+    inspection = DeviceInspection(**inspection_data)
+    db.add(inspection)
+    await db.run_sync(lambda sync_db: db_analytics.add_to_inspection_summaries(sync_db, [inspection_data]))
+    await db.commit()
+    return inspection
+
+
+# Funktion zum Abrufen aller Inspektionen (async)
+async def get_all_device_inspections_async(db: AsyncSession):
+    return (await db.execute(select(DeviceInspection))).scalars().all()
+
+
+# Funktion zum Abrufen einer einzelnen Inspektion anhand der ID (async)
+async def get_device_inspection_by_id_async(db: AsyncSession, inspection_id):
+    return await db.get(DeviceInspection, inspection_id)
+
+
+# Funktion zum seitenweisen Abrufen von Inspektionen (async)
+async def get_device_inspections_page_async(db: AsyncSession, user_id=None, after_id=None, limit=50,
+                                            date_from=None, date_to=None):
+    query = _device_inspections_page_query(user_id, after_id, limit, date_from, date_to)
+    return (await db.execute(query)).scalars().all()
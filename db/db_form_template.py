@@ -0,0 +1,32 @@
+from sqlalchemy.orm.session import Session
+
+from db.models import FormTemplate
+
+
+# Funktion zum Abrufen aller Vorlagen, deren Anzahl Feldbezeichnungen im angegebenen Bereich liegt
+def get_form_templates(db: Session, min_labels: int, max_labels: int):
+    return db.query(FormTemplate).filter(FormTemplate.label_count >= min_labels,
+                                         FormTemplate.label_count <= max_labels).all()
+
+
+# Funktion zum Hinzufügen einer neuen Formularvorlage ohne Commit (für die Schreib-Warteschlange), gibt die ID zurück
+def create_form_template(db: Session, labels: list, fields: str):
+    template = FormTemplate(labels=labels, label_count=len(labels), fields=fields, hits=0)
+    db.add(template)
+    db.flush()
+    return template.id
+
+
+# Funktion zum Ersetzen der Felder einer bestehenden Vorlage ohne Commit (für die Schreib-Warteschlange)
+def update_form_template_fields(db: Session, template_id: int, fields: str):
+    db.query(FormTemplate).filter(FormTemplate.id == template_id).update({FormTemplate.fields: fields})
+
+
+# Funktion zum Zählen eines Treffers ohne Commit (für die Schreib-Warteschlange)
+def record_form_template_hit(db: Session, template_id: int):
+    db.query(FormTemplate).filter(FormTemplate.id == template_id).update({FormTemplate.hits: FormTemplate.hits + 1})
+
+
+# Funktion zum Abrufen aller Vorlagen (Übersicht)
+def get_all_form_templates(db: Session):
+    return db.query(FormTemplate).order_by(FormTemplate.hits.desc()).all()
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from sqlalchemy.orm.session import Session
+
+from db.models import FormJob
+
+
+# Funktion zum Anlegen der Aufträge eines Stapels (Status "queued") ohne Commit (für die Schreib-Warteschlange),
+# gibt die neuen IDs zurück
+def create_form_jobs(db: Session, batch_id: str, filenames: list, owner: str = None):
+    jobs = [FormJob(batch_id=batch_id, filename=filename, status="queued", owner=owner) for filename in filenames]
+    db.add_all(jobs)
+    db.flush()
+    return [job.id for job in jobs]
+
+
+# Funktion zum Aktualisieren des Status (und ggf. Ergebnisses) eines Auftrags ohne Commit (für die Schreib-Warteschlange)
+def update_form_job(db: Session, job_id: int, status: str, result: str = None, error: str = None):
+    values = {FormJob.status: status, FormJob.result: result, FormJob.error: error}
+    if status in ("done", "failed"):
+        values[FormJob.finished_at] = datetime.utcnow()
+    db.query(FormJob).filter(FormJob.id == job_id).update(values)
+
+
+# Funktion zum Abrufen eines einzelnen Auftrags anhand der ID
+def get_form_job(db: Session, job_id: int):
+    return db.query(FormJob).filter(FormJob.id == job_id).first()
+
+
+# Funktion zum Abrufen aller Aufträge eines Stapels
+def get_form_jobs_by_batch(db: Session, batch_id: str):
+    return db.query(FormJob).filter(FormJob.batch_id == batch_id).order_by(FormJob.id).all()
+
+
+# Funktion zum Abrufen der noch nicht abgeschlossenen Aufträge als (ID, Besitzer)
+def get_unfinished_form_jobs(db: Session):
+    return db.query(FormJob.id, FormJob.owner).filter(FormJob.status.in_(("queued", "running"))).all()
+
+
+# Funktion zum Abschließen von Aufträgen, deren Serverprozess nicht mehr läuft, ohne Commit (für die Schreib-Warteschlange)
+# (die Warteschlange liegt nur im Speicher, die hochgeladenen Dateien sind mit dem Prozess verloren)
+def fail_interrupted_form_jobs(db: Session, job_ids: list):
+    if not job_ids:
+        return 0
+    count = db.query(FormJob).filter(FormJob.id.in_(job_ids), FormJob.status.in_(("queued", "running"))).update(
+        {FormJob.status: "failed", FormJob.error: "interrupted by a server restart, please upload again",
+         FormJob.finished_at: datetime.utcnow()}, synchronize_session=False)
+    return count
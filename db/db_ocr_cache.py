@@ -0,0 +1,37 @@
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm.session import Session
+
+from db.models import OcrCacheEntry
+
+
+# Funktion zum Abrufen eines OCR-Ergebnisses anhand des Inhalts-Hashes (nur lesend), gibt (Text, last_used) zurück
+def get_ocr_text(db: Session, key: str):
+    return db.query(OcrCacheEntry.text, OcrCacheEntry.last_used).filter(OcrCacheEntry.key == key).first()
+
+
+# Funktion zum Aktualisieren des Zeitpunkts der letzten Nutzung ohne Commit (für die Schreib-Warteschlange)
+def touch_ocr_entry(db: Session, key: str):
+    db.query(OcrCacheEntry).filter(OcrCacheEntry.key == key).update({OcrCacheEntry.last_used: time.time()})
+
+
+# Funktion zum Speichern (bzw. Überschreiben) eines OCR-Ergebnisses ohne Commit (für die Schreib-Warteschlange)
+def save_ocr_text(db: Session, key: str, text: str):
+    db.merge(OcrCacheEntry(key=key, text=text, size=len(text.encode("utf-8")), last_used=time.time()))
+
+
+# Funktion zum Entfernen der am längsten unbenutzten Einträge, bis die Gesamtgröße eingehalten wird,
+# ohne Commit (für die Schreib-Warteschlange)
+def evict_ocr_entries(db: Session, max_bytes: int):
+    total = db.query(func.coalesce(func.sum(OcrCacheEntry.size), 0)).scalar()
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for key, size in db.query(OcrCacheEntry.key, OcrCacheEntry.size).order_by(OcrCacheEntry.last_used).all():
+        if total <= max_bytes:
+            break
+        db.query(OcrCacheEntry).filter(OcrCacheEntry.key == key).delete()
+        total -= size
+        removed += 1
+    return removed
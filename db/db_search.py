@@ -0,0 +1,84 @@
+import re
+import sys
+
+from sqlalchemy import text, Integer, JSON, DateTime, String, Float
+from sqlalchemy.orm.session import Session
+
+# Volltextindex über die Felder in "data" ("Schlüssel: Wert" je Zeile), rowid = ID der Inspektion
+# remove_diacritics 2: "Kältepumpe" findet auch "kaltepumpe"; prefix: schnelle Präfixsuche ("kompress*")
+SEARCH_TABLE = "inspection_fts"
+
+# Text einer Inspektion für den Index (läuft in SQLite, damit die Trigger jeden Schreibpfad abdecken)
+_DOCUMENT = "(SELECT group_concat(coalesce(key || ': ', '') || value, char(10)) FROM json_each({row}.data))"
+
+SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    # Trigger halten den Index bei Insert, Update und Delete in derselben Transaktion aktuell
+    f"CREATE TRIGGER IF NOT EXISTS device_inspection_fts_insert AFTER INSERT ON device_inspection BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, body) VALUES (new.id, {_DOCUMENT.format(row='new')}); END",
+    f"CREATE TRIGGER IF NOT EXISTS device_inspection_fts_update AFTER UPDATE OF data ON device_inspection BEGIN "
+    f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, body) VALUES (new.id, {_DOCUMENT.format(row='new')}); END",
+    f"CREATE TRIGGER IF NOT EXISTS device_inspection_fts_delete AFTER DELETE ON device_inspection BEGIN "
+    f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; END",
+]
+
+
+# Suchbegriffe in eine sichere FTS5-Abfrage übersetzen: jedes Wort wird zitiert (alle müssen vorkommen),
+# ein "*" am Wortende bleibt als Präfixsuche erhalten
+def build_match_query(query: str):
+    terms = []
+    for word in re.findall(r"[^\s\"]+", query):
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word + '"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+
+# Index, Trigger und (falls leer) den Inhalt anlegen, z. B. beim ersten Start mit einer bestehenden Datenbank
+def ensure_search_index(db: Session):
+    exists = db.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": SEARCH_TABLE}).first()
+    for statement in SEARCH_DDL:
+        db.execute(text(statement))
+    db.commit()
+    if not exists:
+        rebuild_search_index(db)
+
+
+# Funktion zum vollständigen Neuaufbau des Suchindex aus allen Inspektionen (in einer Transaktion)
+def rebuild_search_index(db: Session):
+    db.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    db.execute(text(f"INSERT INTO {SEARCH_TABLE}(rowid, body) "
+                    f"SELECT id, {_DOCUMENT.format(row='device_inspection')} FROM device_inspection"))
+    db.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+    db.commit()
+
+
+# Funktion zur Volltextsuche, nach Relevanz (bm25) sortiert, seitenweise über limit/offset
+def search_device_inspections(db: Session, match_query: str, user_id=None, limit=20, offset=0):
+    user_filter = "AND d.user_id = :user_id" if user_id is not None else ""
+    return db.execute(text(
+        f"SELECT d.id, d.data, d.user_id, d.created_at, "
+        f"snippet({SEARCH_TABLE}, 0, '[', ']', '…', 12) AS snippet, {SEARCH_TABLE}.rank AS score "
+        f"FROM {SEARCH_TABLE} JOIN device_inspection d ON d.id = {SEARCH_TABLE}.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH :query {user_filter} "
+        f"ORDER BY {SEARCH_TABLE}.rank LIMIT :limit OFFSET :offset")
+        .columns(id=Integer, data=JSON, user_id=Integer, created_at=DateTime, snippet=String, score=Float),
+        {"query": match_query, "user_id": user_id, "limit": limit, "offset": offset}).all()
+
+
+# Neuaufbau von der Kommandozeile: python -m db.db_search rebuild
+if __name__ == "__main__":
+    from db.database import sessionLocal
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m db.db_search rebuild")
+    session = sessionLocal()
+    try:
+        ensure_search_index(session)
+        rebuild_search_index(session)
+        print("search index rebuilt")
+    finally:
+        session.close()
@@ -1,3 +1,5 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 from schemas import UserBase, UserBase2
 from db.models import DbUser
@@ -5,14 +7,27 @@ from db.hash import Hash
 from fastapi.exceptions import HTTPException
 from fastapi import status
 from db import models
+from auth import user_cache
 
 
-# create user
-def create_user(db: Session, request: UserBase):
-    user = DbUser(username=request.username,
+# build user (hashes the password, no database access)
+def build_user(request: UserBase):
+    return DbUser(username=request.username,
                   email=request.email,
                   password=Hash.bcrypt(request.password)
                   )
+
+
+# add user without commit (for the write queue), returns the new id
+def add_user(db: Session, user: DbUser):
+    db.add(user)
+    db.flush()
+    return user.id
+
+
+# create user
+def create_user(db: Session, request: UserBase):
+    user = build_user(request)
     db.add(user)
     db.commit()
     db.refresh(user)
@@ -47,6 +62,7 @@ def delete_user(user_id: int, db: Session):
     user = get_user(user_id, db)
     db.delete(user)
     db.commit()
+    user_cache.invalidate_user(user_id)
     return "ok"
 
 
@@ -60,9 +76,17 @@ def update_user(user_id: int, db: Session, request: UserBase2):
 
     })
     db.commit()
+    user_cache.invalidate_user(user_id)
     return "ok"
 
 
+# set a new password hash without commit (for the write queue, e.g. rehash on login);
+# the caller invalidates the cached user once the write queue has committed
+def set_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(DbUser).filter(DbUser.id == user_id).update({DbUser.password: hashed_password})
+    return user_id
+
+
 def get_device_inspections_by_user(db: Session, user_id: int):
     return db.query(models.DeviceInspection).filter(models.DeviceInspection.user_id == user_id).all()
 
@@ -70,3 +94,34 @@ def get_device_inspections_by_user(db: Session, user_id: int):
 def get_user_by_username_password(db: Session, username: str, password: str):
     return db.query(models.DbUser).filter(models.DbUser.username == username,
                                           models.DbUser.password == password).first()
+
+
+# --- async variants (AsyncSession, for async def routes) ---
+
+# read_all (async)
+async def get_all_users_async(db: AsyncSession):
+    return (await db.execute(select(DbUser))).scalars().all()
+
+
+# read_one (async)
+async def get_user_async(user_id: int, db: AsyncSession):
+    return await db.get(DbUser, user_id)
+
+
+# read_one(username) (async), None if the user does not exist
+async def find_user_by_username_async(username: str, db: AsyncSession):
+    return (await db.execute(select(DbUser).where(DbUser.username == username))).scalars().first()
+
+
+# read_one(username) (async)
+async def get_user_by_username_async(username: str, db: AsyncSession):
+    user = await find_user_by_username_async(username, db)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="user not found")
+    return user
+
+
+async def get_device_inspections_by_user_async(db: AsyncSession, user_id: int):
+    query = select(models.DeviceInspection).where(models.DeviceInspection.user_id == user_id)
+    return (await db.execute(query)).scalars().all()
@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy.orm.session import Session
+
+from db.models import VoiceSession
+
+
+# Funktion zum Anlegen einer Sitzung (ohne Commit, für die Schreibwarteschlange); entfernt dabei abgelaufene Sitzungen
+def create_voice_session(db: Session, fields: list, expired_before: datetime):
+    db.query(VoiceSession).filter(VoiceSession.updated_at < expired_before).delete(synchronize_session=False)
+    voice_session = VoiceSession(id=uuid.uuid4().hex, fields=fields, field_values={}, utterances=0)
+    db.add(voice_session)
+    return voice_session.id
+
+
+# Funktion zum Abrufen einer nicht abgelaufenen Sitzung
+def get_voice_session(db: Session, session_id: str, expired_before: datetime):
+    return db.query(VoiceSession).filter(VoiceSession.id == session_id,
+                                         VoiceSession.updated_at >= expired_before).first()
+
+
+# Funktion zum Übernehmen geänderter Feldwerte (ohne Commit); gibt alle Werte und die tatsächlich geänderten zurück
+def merge_voice_session_values(db: Session, session_id: str, delta: dict):
+    voice_session = db.query(VoiceSession).filter(VoiceSession.id == session_id).first()
+    if voice_session is None:
+        return None
+    changed = {name: value for name, value in delta.items() if voice_session.field_values.get(name) != value}
+    # Neues Dict zuweisen, damit SQLAlchemy die Änderung der JSON-Spalte bemerkt
+    voice_session.field_values = {**voice_session.field_values, **changed}
+    voice_session.utterances += 1
+    voice_session.updated_at = datetime.utcnow()
+    return dict(voice_session.field_values), changed
+
+
+# Funktion zum Löschen einer Sitzung (ohne Commit), gibt zurück, ob sie existierte
+def delete_voice_session(db: Session, session_id: str):
+    return db.query(VoiceSession).filter(VoiceSession.id == session_id).delete(synchronize_session=False) > 0
@@ -1,9 +1,58 @@
+import asyncio  # Für das Warten auf den Thread-Pool in async Routen
+import os  # Für die Konfiguration über Umgebungsvariablen
+import threading  # Für die Begrenzung der wartenden Hash-Aufträge
+import time  # Zeitmessung für /metrics
+from concurrent.futures import ThreadPoolExecutor  # Eigener Thread-Pool für bcrypt
+
+from dotenv import load_dotenv  # Laden der Umgebungsvariablen aus .env
+from fastapi import HTTPException, status  # 503, wenn zu viele Hash-Aufträge warten
+from services import metrics  # Laufzeit und Anzahl laufender Hash-Aufträge für /metrics
 from passlib.context import \
     CryptContext  # Import der CryptContext-Klasse, die zur Verwaltung von Passwort-Hashing-Schemata verwendet wird
 
+load_dotenv()
+
+# Kostenfaktor für bcrypt; wird er erhöht, werden bestehende Hashes beim nächsten Login neu berechnet
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Threads, die gleichzeitig bcrypt rechnen (bcrypt gibt die GIL frei, läuft also wirklich parallel)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+# Maximale Anzahl laufender plus wartender Hash-Aufträge; darüber hinaus wird mit 503 abgelehnt
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", 64))
+
 # Erstellen eines CryptContext für die Verwendung des bcrypt-Hashing-Algorithmus
 # "deprecated='auto'" bedeutet, dass veraltete Hashing-Algorithmen automatisch markiert werden
-pwd_cxt = CryptContext(schemes="bcrypt", deprecated="auto")
+pwd_cxt = CryptContext(schemes="bcrypt", deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Eigener, größenbegrenzter Thread-Pool, damit Login-Spitzen weder die Event-Loop noch den
+# allgemeinen Thread-Pool von FastAPI blockieren
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+def _submit(fn, *args):
+    """
+    Übergibt eine Hash-Funktion an den bcrypt-Thread-Pool.
+
+    Rückgabewert:
+    - Ein concurrent.futures.Future mit dem Ergebnis.
+
+    Wirft eine HTTP 503-Ausnahme, wenn bereits HASH_QUEUE_LIMIT Aufträge laufen oder warten.
+    """
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many password operations in progress, please try again")
+    in_flight = metrics.STAGE_IN_FLIGHT.labels("password_hash")
+    in_flight.inc()
+    started = time.perf_counter()
+    future = _executor.submit(fn, *args)
+
+    def done(_):
+        _slots.release()
+        in_flight.dec()
+        metrics.observe("password_hash", time.perf_counter() - started)
+
+    future.add_done_callback(done)
+    return future
 
 
 # Eine Hilfsklasse für Passwort-Hashing und Verifizierung
@@ -14,6 +63,10 @@ class Hash:
     Methoden:
     - bcrypt: Hasht ein Passwort mithilfe des bcrypt-Algorithmus.
     - verify: Überprüft, ob ein gegebenes Klartextpasswort mit einem gehashten Passwort übereinstimmt.
+    - verify_and_update: Überprüft das Passwort und liefert bei Bedarf einen neuen Hash (Rehash beim Login).
+    - *_async: Varianten für async Routen.
+
+    Alle Berechnungen laufen in einem eigenen, größenbegrenzten Thread-Pool.
     """
 
     @staticmethod
@@ -27,7 +80,7 @@ class Hash:
         Rückgabewert:
         - Ein gehashter String, der das gehashte Passwort enthält.
         """
-        return pwd_cxt.hash(password)  # Hasht das Passwort und gibt den gehashten Wert zurück
+        return _submit(pwd_cxt.hash, password).result()  # Hasht das Passwort im bcrypt-Thread-Pool
 
     @staticmethod
     def verify(hashed_password: str, plain_password: str) -> bool:
@@ -41,4 +94,36 @@ class Hash:
         Rückgabewert:
         - True, wenn das Klartextpasswort dem gehashten Passwort entspricht, andernfalls False.
         """
-        return pwd_cxt.verify(plain_password, hashed_password)  # Überprüft, ob das Klartextpasswort korrekt ist
+        return _submit(pwd_cxt.verify, plain_password, hashed_password).result()  # Überprüft das Passwort im bcrypt-Thread-Pool
+
+    @staticmethod
+    def verify_and_update(hashed_password: str, plain_password: str):
+        """
+        Verifiziert ein Klartextpasswort und liefert bei veralteten Parametern (z. B. geänderte
+        BCRYPT_ROUNDS) gleich einen neu berechneten Hash mit.
+
+        Rückgabewert:
+        - (gültig, neuer_hash): neuer_hash ist None, wenn keine Aktualisierung nötig ist.
+        """
+        return _submit(pwd_cxt.verify_and_update, plain_password, hashed_password).result()
+
+    @staticmethod
+    async def bcrypt_async(password: str) -> str:
+        """
+        Wie bcrypt, blockiert aber die Event-Loop nicht (für async Routen).
+        """
+        return await asyncio.wrap_future(_submit(pwd_cxt.hash, password))
+
+    @staticmethod
+    async def verify_async(hashed_password: str, plain_password: str) -> bool:
+        """
+        Wie verify, blockiert aber die Event-Loop nicht (für async Routen).
+        """
+        return await asyncio.wrap_future(_submit(pwd_cxt.verify, plain_password, hashed_password))
+
+    @staticmethod
+    async def verify_and_update_async(hashed_password: str, plain_password: str):
+        """
+        Wie verify_and_update, blockiert aber die Event-Loop nicht (für async Routen).
+        """
+        return await asyncio.wrap_future(_submit(pwd_cxt.verify_and_update, plain_password, hashed_password))
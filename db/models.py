@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, JSON
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, ForeignKey, JSON, Text, Float, DateTime, PrimaryKeyConstraint
 from sqlalchemy.orm import relationship
 from db.database import Base
 
@@ -16,5 +17,60 @@ class DeviceInspection(Base):
     __tablename__ = "device_inspection"
     id = Column(Integer, primary_key=True, index=True)
     data = Column(JSON, nullable=False)
-    user_id = Column(Integer, ForeignKey('user.id'))
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
     user = relationship("DbUser", back_populates="items")
+
+# OCR-Cache-Modell (extrahierter Text, adressiert über den Hash der hochgeladenen Datei)
+class OcrCacheEntry(Base):
+    __tablename__ = "ocr_cache"
+    key = Column(String, primary_key=True)
+    text = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    last_used = Column(Float, nullable=False, index=True)
+
+# Modell für Aufträge der Stapelverarbeitung (ein Auftrag pro hochgeladener Datei)
+class FormJob(Base):
+    __tablename__ = "form_job"
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    result = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    owner = Column(String)  # "host:pid" des Serverprozesses, in dessen Warteschlange der Auftrag liegt
+
+# Modell für bekannte Formularvorlagen (Feldbezeichnungen aus dem OCR-Text und zugehörige Felder)
+class FormTemplate(Base):
+    __tablename__ = "form_template"
+    id = Column(Integer, primary_key=True, index=True)
+    labels = Column(JSON, nullable=False)
+    label_count = Column(Integer, nullable=False, index=True)
+    fields = Column(Text, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+# Modell für vorberechnete Auswertungen (Anzahl und Kältepumpen-Statistik je Gerät, Ort, Monat und gesamt)
+# Wird beim Speichern einer Inspektion in derselben Transaktion fortgeschrieben
+class InspectionSummary(Base):
+    __tablename__ = "inspection_summary"
+    dimension = Column(String, nullable=False)  # total, device, location, month
+    key = Column(String, nullable=False)
+    inspections = Column(Integer, nullable=False, default=0)
+    kaeltepump_count = Column(Integer, nullable=False, default=0)
+    kaeltepump_sum = Column(Float, nullable=False, default=0)
+    kaeltepump_min = Column(Float)
+    kaeltepump_max = Column(Float)
+    __table_args__ = (PrimaryKeyConstraint("dimension", "key"),)
+
+# Sprach-Ausfüllsitzung (Feldnamen des Formulars und bisher diktierte Werte)
+class VoiceSession(Base):
+    __tablename__ = "voice_session"
+    id = Column(String, primary_key=True)
+    fields = Column(JSON, nullable=False)
+    field_values = Column(JSON, nullable=False)
+    utterances = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from db.database import sessionLocal
+from services import metrics
+
+# Maximale Anzahl Schreibaufträge, die gemeinsam in einer Transaktion committet werden
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", 64))
+
+
+class WriteQueue:
+    """
+    Serialisiert Schreibzugriffe auf SQLite über einen einzigen Writer-Thread.
+
+    Ein Auftrag ist eine Funktion fn(db), die Objekte hinzufügt bzw. ändert, aber nicht committet,
+    und einfache Werte (z. B. IDs) zurückgibt. Alle gerade wartenden Aufträge werden in einer
+    Transaktion ausgeführt und gemeinsam committet (Group Commit). Schlägt ein Auftrag fehl,
+    wird der Stapel zurückgerollt und jeder Auftrag einzeln wiederholt, sodass nur der
+    fehlerhafte Auftrag seinen Fehler erhält.
+    """
+
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn):
+        """Auftrag ausführen und blockierend auf das Ergebnis warten (für synchrone Routen)."""
+        return self.submit(fn).result()
+
+    async def run_async(self, fn):
+        """Auftrag ausführen, ohne die Event-Loop zu blockieren (für async Routen)."""
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def depth(self) -> int:
+        """Anzahl der Aufträge, die auf den Writer-Thread warten (für /metrics)."""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            metrics.DB_WRITE_BATCH_SIZE.observe(len(batch))
+            with metrics.track("db_write_batch"):
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        if len(batch) == 1:
+            self._commit_single(*batch[0])
+            return
+
+        db = sessionLocal()
+        try:
+            results = [fn(db) for fn, _ in batch]
+            db.commit()
+        except Exception:
+            db.rollback()
+            results = None
+        finally:
+            db.close()
+
+        if results is None:
+            for fn, future in batch:
+                self._commit_single(fn, future)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    @staticmethod
+    def _commit_single(fn, future):
+        db = sessionLocal()
+        try:
+            result = fn(db)
+            db.commit()
+            future.set_result(result)
+        except Exception as e:
+            db.rollback()
+            future.set_exception(e)
+        finally:
+            db.close()
+
+
+write_queue = WriteQueue(DB_WRITE_BATCH)
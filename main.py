@@ -1,8 +1,12 @@
+import asyncio
+
 from fastapi import FastAPI, Depends, HTTPException, Request
 from db.database import Base, get_db
-from db.database import engine
+from db.database import engine, async_engine, sessionLocal
+from db import db_analytics, db_search
 from routers import user_router, router, router_ai
 from auth import authentication
+from services import ocr, ai_client, form_jobs, metrics, prompt_budget
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
@@ -27,5 +31,36 @@ app.include_router(router.router)
 app.include_router(authentication.router)
 app.include_router(router_ai.router)
 
+# Time every SQL statement (sync and async engine) for /metrics
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
 # Create database tables if they do not exist
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+
+# Build the inspection summaries and the search index once if they were just created for an existing database
+with sessionLocal() as db:
+    db_analytics.ensure_inspection_summaries(db)
+    db_search.ensure_search_index(db)
+
+# Batch jobs of server processes that have exited were lost with their in-memory queue; let their pollers finish
+# (jobs of sibling workers that are still running stay untouched)
+form_jobs.fail_interrupted_jobs()
+
+# Load the prompt tokenizer before the first request; a download that takes too long continues in the background
+# and tokens are estimated until it is done
+@app.on_event("startup")
+async def load_tokenizer():
+    loading = asyncio.get_running_loop().run_in_executor(None, prompt_budget.load_encoding)
+    try:
+        await asyncio.wait_for(asyncio.shield(loading), prompt_budget.PROMPT_TOKENIZER_LOAD_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("Tokenizer not loaded yet, estimating prompt tokens until it is")
+
+# Stop the batch workers and OCR processes and close the OpenAI connection pool when the server shuts down
+@app.on_event("shutdown")
+async def shutdown_workers():
+    await form_jobs.stop()
+    ocr.shutdown()
+    await ai_client.close()
+    await async_engine.dispose()
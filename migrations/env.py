@@ -66,13 +66,25 @@ from db.database import engine
 target_metadata = Base.metadata
 
 # Migration ausführen
+# Der FTS5-Suchindex (virtuelle Tabelle und ihre Schattentabellen) wird per SQL gepflegt, nicht über die Modelle
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "table" and name.startswith("inspection_fts"))
+
+
 def run_migrations_online():
     connectable = engine
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
-            compare_type=True
+            compare_type=True,
+            include_object=include_object
         )
         with context.begin_transaction():
             context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
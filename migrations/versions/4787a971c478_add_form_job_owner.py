@@ -0,0 +1,33 @@
+"""Add owner to form_job
+
+Revision ID: 4787a971c478
+Revises: a9d3e5c7f214
+Create Date: 2026-10-18 18:02:47.315906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4787a971c478'
+down_revision: Union[str, None] = 'a9d3e5c7f214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by create_all of the current app already have the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('form_job')}
+    if 'owner' not in columns:
+        with op.batch_alter_table('form_job') as batch_op:
+            batch_op.add_column(sa.Column('owner', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('form_job')}
+    if 'owner' in columns:
+        with op.batch_alter_table('form_job') as batch_op:
+            batch_op.drop_column('owner')
@@ -0,0 +1,29 @@
+"""Add user_id index and created_at column to DeviceInspection
+
+Revision ID: 5d3f8a1c2e47
+Revises: 9b7496ee3d0a
+Create Date: 2026-10-18 10:12:41.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d3f8a1c2e47'
+down_revision: Union[str, None] = '9b7496ee3d0a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('device_inspection', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_device_inspection_user_id', 'device_inspection', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_device_inspection_user_id', table_name='device_inspection')
+    with op.batch_alter_table('device_inspection') as batch_op:
+        batch_op.drop_column('created_at')
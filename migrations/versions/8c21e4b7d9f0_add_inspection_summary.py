@@ -0,0 +1,39 @@
+"""Add inspection_summary table
+
+Revision ID: 8c21e4b7d9f0
+Revises: 5d3f8a1c2e47
+Create Date: 2026-10-18 12:31:07.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c21e4b7d9f0'
+down_revision: Union[str, None] = '5d3f8a1c2e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases that already ran the app have the table from create_all
+    if sa.inspect(op.get_bind()).has_table('inspection_summary'):
+        return
+    op.create_table(
+        'inspection_summary',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('inspections', sa.Integer(), nullable=False),
+        sa.Column('kaeltepump_count', sa.Integer(), nullable=False),
+        sa.Column('kaeltepump_sum', sa.Float(), nullable=False),
+        sa.Column('kaeltepump_min', sa.Float(), nullable=True),
+        sa.Column('kaeltepump_max', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('dimension', 'key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('inspection_summary')
@@ -0,0 +1,45 @@
+"""Add FTS5 search index over DeviceInspection data
+
+Revision ID: a47c3e9d1b52
+Revises: 8c21e4b7d9f0
+Create Date: 2026-10-18 13:05:44.201366
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a47c3e9d1b52'
+down_revision: Union[str, None] = '8c21e4b7d9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DOCUMENT = "(SELECT group_concat(coalesce(key || ': ', '') || value, char(10)) FROM json_each({row}.data))"
+
+
+def upgrade() -> None:
+    # Databases that already ran the app have the index, its triggers and its content from ensure_search_index
+    exists = sa.inspect(op.get_bind()).has_table('inspection_fts')
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS inspection_fts USING fts5("
+               "body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+    op.execute("CREATE TRIGGER IF NOT EXISTS device_inspection_fts_insert AFTER INSERT ON device_inspection BEGIN "
+               f"INSERT INTO inspection_fts(rowid, body) VALUES (new.id, {DOCUMENT.format(row='new')}); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS device_inspection_fts_update AFTER UPDATE OF data ON device_inspection BEGIN "
+               "DELETE FROM inspection_fts WHERE rowid = old.id; "
+               f"INSERT INTO inspection_fts(rowid, body) VALUES (new.id, {DOCUMENT.format(row='new')}); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS device_inspection_fts_delete AFTER DELETE ON device_inspection BEGIN "
+               "DELETE FROM inspection_fts WHERE rowid = old.id; END")
+    if exists:
+        return
+    op.execute("INSERT INTO inspection_fts(rowid, body) "
+               f"SELECT id, {DOCUMENT.format(row='device_inspection')} FROM device_inspection")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS device_inspection_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS device_inspection_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS device_inspection_fts_insert")
+    op.execute("DROP TABLE IF EXISTS inspection_fts")
@@ -0,0 +1,50 @@
+"""Match form templates by field labels instead of an image hash
+
+Revision ID: a9d3e5c7f214
+Revises: f2b6d8e4a157
+Create Date: 2026-10-18 16:41:05.619832
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e5c7f214'
+down_revision: Union[str, None] = 'f2b6d8e4a157'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by create_all of the current app already have the labels columns
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('form_template')}
+    # Templates registered by image hash carry no labels to confirm a match with; they are registered again
+    op.execute("DELETE FROM form_template")
+    with op.batch_alter_table('form_template') as batch_op:
+        if 'fingerprint' in columns:
+            batch_op.drop_column('fingerprint')
+        if 'page_count' in columns:
+            batch_op.drop_column('page_count')
+        if 'labels' not in columns:
+            batch_op.add_column(sa.Column('labels', sa.JSON(), nullable=False))
+        if 'label_count' not in columns:
+            batch_op.add_column(sa.Column('label_count', sa.Integer(), nullable=False))
+            batch_op.create_index(batch_op.f('ix_form_template_label_count'), ['label_count'], unique=False)
+
+
+def downgrade() -> None:
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('form_template')}
+    op.execute("DELETE FROM form_template")
+    with op.batch_alter_table('form_template') as batch_op:
+        if 'label_count' in columns:
+            batch_op.drop_index(batch_op.f('ix_form_template_label_count'))
+            batch_op.drop_column('label_count')
+        if 'labels' in columns:
+            batch_op.drop_column('labels')
+        if 'fingerprint' not in columns:
+            batch_op.add_column(sa.Column('fingerprint', sa.String(), nullable=False))
+        if 'page_count' not in columns:
+            batch_op.add_column(sa.Column('page_count', sa.Integer(), nullable=False))
@@ -0,0 +1,40 @@
+"""Add voice_session table
+
+Revision ID: c3f5a9e1d7b4
+Revises: a47c3e9d1b52
+Create Date: 2026-10-18 15:12:38.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f5a9e1d7b4'
+down_revision: Union[str, None] = 'a47c3e9d1b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases that already ran the app have the table from create_all
+    if sa.inspect(op.get_bind()).has_table('voice_session'):
+        return
+    op.create_table(
+        'voice_session',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('fields', sa.JSON(), nullable=False),
+        sa.Column('field_values', sa.JSON(), nullable=False),
+        sa.Column('utterances', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_voice_session_updated_at'), 'voice_session', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_voice_session_updated_at'), table_name='voice_session')
+    op.drop_table('voice_session')
@@ -0,0 +1,38 @@
+"""Add ocr_cache table
+
+Revision ID: d4a8b2c6e913
+Revises: c3f5a9e1d7b4
+Create Date: 2026-10-18 16:02:11.348215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8b2c6e913'
+down_revision: Union[str, None] = 'c3f5a9e1d7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases that already ran the app have the table from create_all
+    if sa.inspect(op.get_bind()).has_table('ocr_cache'):
+        return
+    op.create_table(
+        'ocr_cache',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('last_used', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index(op.f('ix_ocr_cache_last_used'), 'ocr_cache', ['last_used'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ocr_cache_last_used'), table_name='ocr_cache')
+    op.drop_table('ocr_cache')
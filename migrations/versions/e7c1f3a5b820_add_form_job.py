@@ -0,0 +1,44 @@
+"""Add form_job table
+
+Revision ID: e7c1f3a5b820
+Revises: d4a8b2c6e913
+Create Date: 2026-10-18 16:09:47.102566
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c1f3a5b820'
+down_revision: Union[str, None] = 'd4a8b2c6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases that already ran the app have the table from create_all
+    if sa.inspect(op.get_bind()).has_table('form_job'):
+        return
+    op.create_table(
+        'form_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('batch_id', sa.String(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_form_job_id'), 'form_job', ['id'], unique=False)
+    op.create_index(op.f('ix_form_job_batch_id'), 'form_job', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_form_job_batch_id'), table_name='form_job')
+    op.drop_index(op.f('ix_form_job_id'), table_name='form_job')
+    op.drop_table('form_job')
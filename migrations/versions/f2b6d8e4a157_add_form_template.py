@@ -0,0 +1,40 @@
+"""Add form_template table
+
+Revision ID: f2b6d8e4a157
+Revises: e7c1f3a5b820
+Create Date: 2026-10-18 16:15:23.877041
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6d8e4a157'
+down_revision: Union[str, None] = 'e7c1f3a5b820'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases that already ran the app have the table from create_all
+    if sa.inspect(op.get_bind()).has_table('form_template'):
+        return
+    op.create_table(
+        'form_template',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fingerprint', sa.String(), nullable=False),
+        sa.Column('page_count', sa.Integer(), nullable=False),
+        sa.Column('fields', sa.Text(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_form_template_id'), 'form_template', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_form_template_id'), table_name='form_template')
+    op.drop_table('form_template')
@@ -1,26 +1,38 @@
-import pandas as pd
 from db.models import DeviceInspection
 from db.db_device import create_device_inspection
 import schemas
 import tempfile
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from fastapi import APIRouter, Depends, HTTPException, status, Form
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm.session import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from db import models
-from db.database import get_db
+from db.database import get_db, get_async_db
 from db.hash import Hash
-from auth import oauth2
+from auth import oauth2, user_cache
 from fastapi import FastAPI, Request
 from db.db_user import create_user
-from datetime import datetime, timedelta, timezone
+from db import db_user
+from db.writer import write_queue
+from db import db_device
+from db import db_analytics
+from db import db_search
+from datetime import datetime, timedelta, timezone, date
 from typing import Optional
-from fastapi.responses import RedirectResponse, HTMLResponse, Response
-from fastapi import Cookie
+from fastapi.responses import RedirectResponse, HTMLResponse, Response, JSONResponse
+from fastapi import Cookie, Query
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from services import export
+import os
 
 router = APIRouter(tags=["router"])
 templates = Jinja2Templates(directory="templates")
 
+# Upper bound for the page size of the inspection history
+MAX_PAGE_SIZE = 200
+
 
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -28,7 +40,7 @@ async def login_page(request: Request):
 
 
 @router.post("/login", response_class=RedirectResponse)
-async def login(request: Request, db: Session = Depends(get_db)):
+async def login(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Verarbeitet den Benutzer-Login, prüft die Anmeldedaten und erstellt ein JWT-Token. Bei Erfolg wird der Benutzer weitergeleitet und die Anmeldedaten in Cookies gespeichert.
     """
@@ -36,11 +48,18 @@ async def login(request: Request, db: Session = Depends(get_db)):
     username = form_data.get('username')
     password = form_data.get('password')
 
-    user = db.query(models.DbUser).filter(models.DbUser.username == username).first()
-    if not user or not Hash.verify(user.password, password):
+    user = await db_user.find_user_by_username_async(username, db)
+    valid, new_hash = (await Hash.verify_and_update_async(user.password, password)) if user else (False, None)
+    if not valid:
         return templates.TemplateResponse("invalidUserPassword.html",
                                           {"request": request, "error": "Invalid username or password"})
 
+    # Hash mit veralteten Parametern (z. B. geänderte BCRYPT_ROUNDS) transparent ersetzen
+    if new_hash:
+        user_id = user.id
+        await write_queue.run_async(lambda write_db: db_user.set_password_hash(write_db, user_id, new_hash))
+        user_cache.invalidate_user(user_id)
+
     access_token = oauth2.create_access_token(data={"sub": username})
 
     expires = datetime.utcnow() + timedelta(seconds=90000)
@@ -93,8 +112,9 @@ def signup(username: str = Form(...), email: str = Form(...), password: str = Fo
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    # Benutzer erstellen
-    user = create_user(db, schemas.UserBase(username=username, email=email, password=password))
+    # Benutzer erstellen (Passwort-Hash außerhalb, Insert über die serialisierte Schreibwarteschlange)
+    user = db_user.build_user(schemas.UserBase(username=username, email=email, password=password))
+    write_queue.run(lambda write_db: db_user.add_user(write_db, user))
     # return user
     return RedirectResponse(url="/login")
 
@@ -119,3 +139,91 @@ async def homepage(request: Request, user_id: Optional[str] = Cookie(None), user
     return templates.TemplateResponse("profile.html", {"request": request, "user_id": user_id, "username": username})
 
 
+@router.get("/api/inspections", response_model=schemas.InspectionPage)
+def inspection_history(cursor: Optional[int] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                       date_from: Optional[date] = None, date_to: Optional[date] = None,
+                       db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
+    """
+    Liefert die Inspektionen des angemeldeten Benutzers seitenweise (neueste zuerst).
+
+    Parameter:
+    - cursor (int): "next_cursor" der vorherigen Seite; leer für die erste Seite.
+    - limit (int): Seitengröße (maximal MAX_PAGE_SIZE).
+    - date_from / date_to (date): Optionales Datumsintervall (Speicherdatum, inklusiv).
+
+    Rückgabewert:
+    - items und next_cursor (None, wenn keine weiteren Einträge vorhanden sind).
+    """
+    rows = db_device.get_device_inspections_page(db, user_id=current_user.id, after_id=cursor, limit=limit + 1,
+                                                 date_from=date_from, date_to=date_to)
+    items = rows[:limit]
+    next_cursor = items[-1].id if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/api/inspections/search", response_model=schemas.InspectionSearchPage)
+def search_inspections(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                       offset: int = Query(0, ge=0),
+                       db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
+    """
+    Volltextsuche über die Felder der eigenen Inspektionen (FTS5), die besten Treffer zuerst.
+
+    Parameter:
+    - q (str): Suchbegriffe; alle müssen vorkommen, "wort*" sucht nach Präfixen.
+    - limit / offset (int): Seitengröße und Position; next_offset verweist auf die nächste Seite.
+    """
+    match_query = db_search.build_match_query(q)
+    if match_query is None:
+        return {"items": [], "next_offset": None}
+    rows = db_search.search_device_inspections(db, match_query, user_id=current_user.id,
+                                               limit=limit + 1, offset=offset)
+    items = [row._asdict() for row in rows[:limit]]
+    return {"items": items, "next_offset": offset + limit if len(rows) > limit else None}
+
+def _aggregate(summary):
+    return {"key": summary.key, "inspections": summary.inspections, "kaeltepump_count": summary.kaeltepump_count,
+            "kaeltepump_avg": summary.kaeltepump_sum / summary.kaeltepump_count if summary.kaeltepump_count else None,
+            "kaeltepump_min": summary.kaeltepump_min, "kaeltepump_max": summary.kaeltepump_max}
+
+
+@router.get("/api/inspections/aggregates", response_model=schemas.InspectionAggregates)
+def inspection_aggregates(dimension: str = Query("device", regex="^(device|location|month)$"),
+                          db: Session = Depends(get_db), current_user=Depends(oauth2.get_current_user)):
+    """
+    Liefert die vorberechneten Auswertungen über alle Inspektionen: Anzahl und Kältepumpen-Statistik
+    je Gerät, Ort oder Monat sowie die Gesamtwerte. Gelesen werden nur die Zeilen der Auswertungstabelle.
+
+    Parameter:
+    - dimension (str): device, location oder month.
+    """
+    total = db_analytics.get_inspection_summaries(db, "total")
+    groups = db_analytics.get_inspection_summaries(db, dimension)
+    return {"dimension": dimension, "total": _aggregate(total[0]) if total else None,
+            "groups": [_aggregate(summary) for summary in groups]}
+
+@router.get("/api/inspections/export")
+async def export_inspections(export_format: str = Query("csv", alias="format", regex="^(csv|ndjson|xlsx|parquet)$"),
+                             all_users: bool = False, current_user=Depends(oauth2.get_current_user)):
+    """
+    Exportiert die Inspektionen des angemeldeten Benutzers (oder mit all_users=true alle) mit
+    aufgelöster "data"-Spalte. Die Datenbank wird batchweise gelesen, der Speicherbedarf hängt
+    nicht von der Anzahl der Zeilen ab.
+
+    Parameter:
+    - format (str): csv und ndjson werden direkt gestreamt, xlsx und parquet batchweise in
+      eine temporäre Datei geschrieben und anschließend ausgeliefert.
+    - all_users (bool): Alle Inspektionen exportieren; nur für Benutzer in EXPORT_ADMIN_USERS.
+    """
+    if all_users and current_user.username not in export.EXPORT_ADMIN_USERS:
+        return JSONResponse(status_code=403, content={"error": "exporting all users requires an export admin"})
+    user_id = None if all_users else current_user.id
+    media_type, suffix = export.EXPORT_FORMATS[export_format]
+    filename = f"inspections{suffix}"
+
+    if export_format in ("csv", "ndjson"):
+        rows = export.stream_csv(user_id) if export_format == "csv" else export.stream_ndjson(user_id)
+        return StreamingResponse(rows, media_type=media_type,
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+    path = await run_in_threadpool(export.export_to_file, export_format, user_id)
+    return FileResponse(path, media_type=media_type, filename=filename, background=BackgroundTask(os.remove, path))
@@ -1,106 +1,331 @@
 from fastapi import APIRouter, Form, HTTPException, Depends, Request
-from fastapi import FastAPI, UploadFile, File, Body
-from fastapi.responses import JSONResponse, HTMLResponse
-import pytesseract
-from pdf2image import convert_from_bytes
-from PIL import Image
-import openai
+from fastapi import FastAPI, UploadFile, File, Body, Query
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
+from typing import List
+import uuid
+import json
 import os
-import tempfile
-import base64
 from dotenv import load_dotenv
 from db.database import get_db
 from sqlalchemy.orm import Session
-from db.db_device import create_device_inspection
+from db import db_device
+from db.writer import write_queue
+import schemas
+from db import db_job, db_form_template, db_voice_session
+from services import (ocr_cache, ai_client, ai_cache, streaming, form_pipeline, form_jobs, form_registry, metrics,
+                      voice_session, single_flight)
+from services.voice_input import read_voice_input, VoiceInputError
 
 # Initialize FastAPI app
 app = FastAPI()
 
 # Load environment variables
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# Set up Tesseract OCR path
-pytesseract.pytesseract.tesseract_cmd = r"C:\\Program Files\\Tesseract-OCR\\tesseract.exe"
 
 # Create API Router
 router = APIRouter(tags=["router_AI"])
 
+# Maximum number of inspections accepted by one bulk save request
+MAX_BULK_INSPECTIONS = 1000
+
+# Prompt version of the form-matching prompt (part of the GPT response cache key)
+FORM_MATCHING_PROMPT_VERSION = "1"
+
+# Identical recordings for the same fields processed at the same time (double submits) share one run
+voice_flights = single_flight.SingleFlight("process_voice")
+
 # Endpoint to process uploaded form file
 @router.post("/process_form")
-async def process_form(file: UploadFile = File(...)):
+async def process_form(file: UploadFile = File(...), no_cache: bool = Query(False)):
     """Extract form fields from uploaded file using OCR and AI."""
     try:
-        # Save uploaded file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}")
-        temp_file.write(await file.read())
-        temp_file_path = temp_file.name
-        temp_file.close()
-
-        # If PDF, convert to images
-        if file.filename.endswith(".pdf"):
-            images = convert_from_bytes(open(temp_file_path, "rb").read())
-            extracted_text = "\n".join([pytesseract.image_to_string(img) for img in images])
-        else:
-            extracted_text = pytesseract.image_to_string(Image.open(temp_file_path))
-
-        os.remove(temp_file_path)  # Clean up temp file
-
-        # Use OpenAI to extract form fields
-        openai_response = openai.ChatCompletion.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "Extract all user-interactive form fields..."},
-                {"role": "user", "content": extracted_text}
-            ]
-        )
-
-        form_fields = openai_response['choices'][0]['message']['content']
-        print("Extracted text:", extracted_text[:500])
-        print("OpenAI response:", form_fields)
-
-        return JSONResponse(content={"extracted_fields": form_fields})
+        with metrics.track("process_form"):
+            with metrics.track("upload_read"):
+                data = await file.read()
+            form_fields, prompt_report = await form_pipeline.extract_form_fields_shared(data, file.filename,
+                                                                                        bypass_cache=no_cache)
+        metrics.REQUESTS.labels("process_form", "ok").inc()
+        # The prompt figures are missing when a known template answered without GPT
+        return JSONResponse(content={"extracted_fields": form_fields, "prompt": prompt_report or None})
 
     except Exception as e:
         print("Error in /process_form:", e)
+        metrics.REQUESTS.labels("process_form", "error").inc()
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+# Endpoint to queue many form files for background processing
+@router.post("/process_form/batch", status_code=202)
+async def process_form_batch(files: List[UploadFile] = File(...), no_cache: bool = Query(False)):
+    """Queue uploaded forms for processing by the batch workers; poll the batch for results."""
+    if len(files) > form_jobs.free_slots():
+        return JSONResponse(status_code=503, content={"error": "batch queue is full, try again later"})
+
+    batch_id = uuid.uuid4().hex
+    contents = [await file.read() for file in files]
+    filenames = [file.filename for file in files]
+    owner = form_jobs.owner()
+    job_ids = await write_queue.run_async(lambda db: db_job.create_form_jobs(db, batch_id, filenames, owner))
+
+    try:
+        form_jobs.enqueue(list(zip(job_ids, contents, filenames)), bypass_cache=no_cache)
+    except form_jobs.QueueFullError as e:
+        for job_id in job_ids:
+            await form_jobs.set_status(job_id, "failed", None, str(e))
+        return JSONResponse(status_code=503, content={"error": str(e)})
+
+    return {
+        "batch_id": batch_id,
+        "jobs": [{"id": job_id, "filename": filename, "status": "queued"}
+                 for job_id, filename in zip(job_ids, filenames)]
+    }
+
+# Status of all jobs in a batch
+@router.get("/process_form/batch/{batch_id}")
+def get_form_batch(batch_id: str, db: Session = Depends(get_db)):
+    """Return the progress of a batch and the status of each of its jobs."""
+    jobs = db_job.get_form_jobs_by_batch(db, batch_id)
+    if not jobs:
+        return JSONResponse(status_code=404, content={"error": "batch not found"})
+    counts = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    return {
+        "batch_id": batch_id,
+        "total": len(jobs),
+        "counts": counts,
+        "jobs": [{"id": job.id, "filename": job.filename, "status": job.status} for job in jobs]
+    }
+
+# Result of a single batch job
+@router.get("/process_form/jobs/{job_id}")
+def get_form_job(job_id: int, db: Session = Depends(get_db)):
+    """Return status and, once finished, the extracted fields (or error) of one job."""
+    job = db_job.get_form_job(db, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "job not found"})
+    return {
+        "id": job.id,
+        "batch_id": job.batch_id,
+        "filename": job.filename,
+        "status": job.status,
+        "extracted_fields": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+# Known form layouts in the template registry
+@router.get("/process_form/templates")
+def get_form_templates(db: Session = Depends(get_db)):
+    """List registered form templates and registry hit/miss counters."""
+    return {
+        "stats": form_registry.stats,
+        "templates": [{"id": t.id, "labels": t.labels, "hits": t.hits,
+                       "created_at": t.created_at.isoformat(), "extracted_fields": t.fields}
+                      for t in db_form_template.get_all_form_templates(db)]
+    }
+
+# Hit/miss counters of the OCR result cache
+@router.get("/process_form/cache")
+async def ocr_cache_stats():
+    """Return OCR cache statistics."""
+    return ocr_cache.ocr_cache.get_stats()
+
+# Hit/miss counters of the GPT response cache
+@router.get("/ai/cache")
+async def ai_cache_stats():
+    """Return GPT response cache statistics."""
+    return ai_cache.get_stats()
+
+# Per-stage timings, counters and in-flight gauges in the Prometheus text format
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Expose pipeline, OpenAI, OCR, cache and database metrics for Prometheus."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# Prompt that fills the extracted form fields from the transcribed speech
+def form_matching_messages(extracted_fields: str, user_text: str) -> list:
+    return [
+        {"role": "system", "content": f"Using only the field names extracted from the form: {extracted_fields}..."},
+        {"role": "user", "content": user_text}
+    ]
+
 # Endpoint to process voice input and fill form
 @router.post("/process_voice")
-async def process_voice(audio_base64: str = Body(...), extracted_fields: str = Body(...)):
-    """Transcribe audio and match it with form fields."""
-    try:
-        # Decode Base64 audio
-        audio_data = base64.b64decode(audio_base64)
+async def process_voice(request: Request, no_cache: bool = Query(False)):
+    """Transcribe audio and match it with form fields.
 
-        # Save audio temporarily
-        temp_audio_file_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-        with open(temp_audio_file_path, "wb") as audio_file:
-            audio_file.write(audio_data)
+    Accepts multipart or raw binary audio as well as the original base64 JSON body.
+    """
+    try:
+        with metrics.track("upload_read"):
+            voice = await read_voice_input(request)
+    except VoiceInputError as e:
+        metrics.REQUESTS.labels("process_voice", "rejected").inc()
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
 
-        # Transcribe voice to text
-        with open(temp_audio_file_path, "rb") as audio_file:
-            response = openai.Audio.transcribe(model="whisper-1", file=audio_file)
+    # fill_form closes the audio itself when it runs (it may outlive this request for coalesced callers)
+    filling = False
 
-        os.remove(temp_audio_file_path)  # Clean up temp file
+    async def fill_form():
+        nonlocal filling
+        filling = True
+        try:
+            # Transcribe voice to text
+            with metrics.track("whisper"):
+                response = await ai_client.transcribe(voice.audio, filename=voice.filename)
+        finally:
+            voice.close()
         user_text = response['text']
 
-        # Match transcribed text to form fields
-        openai_response = openai.ChatCompletion.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": f"Using only the field names extracted from the form: {extracted_fields}..."},
-                {"role": "user", "content": user_text}
-            ]
-        )
-
-        filled_form = openai_response['choices'][0]['message']['content']
+        # Match transcribed text to form fields (memoized per fields/transcript pair)
+        with metrics.track("gpt_form_matching"):
+            openai_response = await ai_cache.chat_completion(
+                model="gpt-4-turbo",
+                messages=form_matching_messages(voice.extracted_fields, user_text),
+                prompt_version=FORM_MATCHING_PROMPT_VERSION,
+                bypass=no_cache
+            )
+        return openai_response['choices'][0]['message']['content']
 
+    try:
+        with metrics.track("process_voice"):
+            with metrics.track("audio_hash"):
+                audio_hash = await run_in_threadpool(single_flight.content_hash, voice.audio)
+            # extracted_fields may arrive as a JSON object or list in JSON bodies
+            key = (audio_hash, json.dumps(voice.extracted_fields, sort_keys=True, ensure_ascii=False), no_cache)
+            filled_form = await voice_flights.run(key, fill_form)
+        metrics.REQUESTS.labels("process_voice", "ok").inc()
         return JSONResponse(content={"filled_form": filled_form})
 
     except Exception as e:
+        metrics.REQUESTS.labels("process_voice", "error").inc()
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        if not filling:
+            voice.close()
+
+# Streaming variant of /process_voice (Server-Sent Events)
+@router.post("/process_voice/stream")
+async def process_voice_stream(request: Request, no_cache: bool = Query(False)):
+    """Transcribe audio and fill the form, streaming each stage as it completes.
+
+    Accepts the same bodies as /process_voice.
+    Events: ``transcript`` (Whisper result), ``token`` (GPT output piece),
+    ``field`` (a completed field/value pair), ``done`` (full filled form) or ``error``.
+    """
+    try:
+        with metrics.track("upload_read"):
+            voice = await read_voice_input(request)
+    except VoiceInputError as e:
+        metrics.REQUESTS.labels("process_voice_stream", "rejected").inc()
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+
+    async def events():
+        try:
+            with metrics.track("whisper"):
+                response = await ai_client.transcribe(voice.audio, filename=voice.filename)
+            user_text = response['text']
+            yield streaming.sse_event("transcript", {"text": user_text})
+
+            scanner = streaming.JsonFieldScanner()
+            with metrics.track("gpt_form_matching_stream"):
+                async for content in ai_cache.chat_completion_stream(
+                        model="gpt-4-turbo",
+                        messages=form_matching_messages(voice.extracted_fields, user_text),
+                        prompt_version=FORM_MATCHING_PROMPT_VERSION,
+                        bypass=no_cache):
+                    yield streaming.sse_event("token", {"content": content})
+                    for name, value in scanner.feed(content):
+                        yield streaming.sse_event("field", {"name": name, "value": value})
+
+            metrics.REQUESTS.labels("process_voice_stream", "ok").inc()
+            yield streaming.sse_event("done", {"filled_form": scanner.text})
+
+        except Exception as e:
+            metrics.REQUESTS.labels("process_voice_stream", "error").inc()
+            yield streaming.sse_event("error", {"error": str(e)})
+        finally:
+            voice.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Start an incremental fill session for one form
+@router.post("/process_voice/sessions", status_code=201)
+async def create_voice_session(extracted_fields=Body(..., embed=True)):
+    """Create a fill session from the fields returned by /process_form (JSON text, object or list of names)."""
+    fields = voice_session.parse_field_names(extracted_fields)
+    if not fields:
+        return JSONResponse(status_code=422, content={"error": "extracted_fields contains no field names"})
+    session_id = await write_queue.run_async(
+        lambda db: db_voice_session.create_voice_session(db, fields, voice_session.expired_before()))
+    return {"session_id": session_id, "fields": fields, "values": {}, "utterances": 0}
+
+# Current state of a fill session
+@router.get("/process_voice/sessions/{session_id}")
+def get_voice_session(session_id: str, db: Session = Depends(get_db)):
+    """Return the fields and all values dictated so far."""
+    session = db_voice_session.get_voice_session(db, session_id, voice_session.expired_before())
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": "session not found or expired"})
+    return {"session_id": session.id, "fields": session.fields, "values": session.field_values,
+            "utterances": session.utterances}
+
+# Add one recording to a fill session
+@router.post("/process_voice/sessions/{session_id}/utterances")
+async def add_voice_utterance(session_id: str, request: Request, no_cache: bool = Query(False),
+                              db: Session = Depends(get_db)):
+    """Transcribe a short recording and merge the fields it sets into the session.
+
+    Accepts the same bodies as /process_voice, without ``extracted_fields``. The prompt
+    holds only the field names and this transcript, so its size does not grow with the
+    number of recordings; the answer is the ``delta`` of changed fields plus all ``values``.
+    """
+    session = await run_in_threadpool(db_voice_session.get_voice_session, db, session_id,
+                                      voice_session.expired_before())
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": "session not found or expired"})
+    fields = session.fields
+
+    try:
+        with metrics.track("upload_read"):
+            voice = await read_voice_input(request, require_fields=False)
+    except VoiceInputError as e:
+        metrics.REQUESTS.labels("process_voice_session", "rejected").inc()
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+
+    try:
+        with metrics.track("process_voice_session"):
+            try:
+                transcript, delta = await voice_session.transcribe_delta(fields, voice.audio, voice.filename,
+                                                                         bypass_cache=no_cache)
+            finally:
+                voice.close()
+            merged = await write_queue.run_async(
+                lambda db: db_voice_session.merge_voice_session_values(db, session_id, delta))
+    except voice_session.FieldDeltaError as e:
+        metrics.REQUESTS.labels("process_voice_session", "error").inc()
+        return JSONResponse(status_code=502, content={"error": str(e)})
+    except Exception as e:
+        metrics.REQUESTS.labels("process_voice_session", "error").inc()
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+    if merged is None:
+        return JSONResponse(status_code=404, content={"error": "session not found or expired"})
+    values, changed = merged
+    metrics.REQUESTS.labels("process_voice_session", "ok").inc()
+    return {"session_id": session_id, "transcript": transcript, "delta": changed, "values": values}
+
+# End a fill session
+@router.delete("/process_voice/sessions/{session_id}", status_code=204)
+async def delete_voice_session(session_id: str):
+    """Delete the session and its values."""
+    if not await write_queue.run_async(lambda db: db_voice_session.delete_voice_session(db, session_id)):
+        return JSONResponse(status_code=404, content={"error": "session not found"})
+    return Response(status_code=204)
+
 # Serve record.html file for /all (GET)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -121,14 +346,30 @@ async def get_record_voice():
 
 # Save inspection data to database
 @router.post("/api/save_inspection")
-async def save_inspection(data: dict = Body(...), user_id: int = Body(...), db: Session = Depends(get_db)):
-    """Save extracted and processed data into database."""
+async def save_inspection(data: dict = Body(...), user_id: int = Body(...)):
+    """Save extracted and processed data into database (through the serialized write queue)."""
     try:
         inspection_data = {
             "data": data,
             "user_id": user_id
         }
-        inspection = create_device_inspection(db, inspection_data)
-        return {"message": "Inspection saved", "id": inspection.id}
+        with metrics.track("save_inspection"):
+            inspection_id = await write_queue.run_async(lambda db: db_device.add_device_inspection(db, inspection_data))
+        return {"message": "Inspection saved", "id": inspection_id}
     except Exception as e:
         return {"error": str(e)}
+
+# Save many inspections at once (e.g. offline clients syncing)
+@router.post("/api/save_inspection/bulk")
+async def save_inspections_bulk(inspections: List[schemas.InspectionSave] = Body(...)):
+    """Validate a list of inspections and insert them in a single transaction."""
+    if len(inspections) > MAX_BULK_INSPECTIONS:
+        return JSONResponse(status_code=413,
+                            content={"error": f"at most {MAX_BULK_INSPECTIONS} inspections per request"})
+    rows = [{"data": inspection.data, "user_id": inspection.user_id} for inspection in inspections]
+    try:
+        with metrics.track("save_inspection_bulk"):
+            inspection_ids = await write_queue.run_async(lambda db: db_device.add_device_inspections_bulk(db, rows))
+        return {"message": "Inspections saved", "ids": inspection_ids}
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
@@ -24,6 +24,51 @@ class DeviceInspection(DeviceInspectionInput):
         orm_mode = True
 
 
+class InspectionSave(BaseModel):
+    data: dict
+    user_id: int
+
+
+class InspectionRecord(BaseModel):
+    id: int
+    data: dict
+    user_id: Optional[int]
+    created_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class InspectionPage(BaseModel):
+    items: List[InspectionRecord]
+    next_cursor: Optional[int] = None
+
+
+class InspectionSearchHit(InspectionRecord):
+    snippet: Optional[str] = None
+    score: float
+
+
+class InspectionSearchPage(BaseModel):
+    items: List[InspectionSearchHit]
+    next_offset: Optional[int] = None
+
+
+class InspectionAggregate(BaseModel):
+    key: str
+    inspections: int
+    kaeltepump_count: int
+    kaeltepump_avg: Optional[float] = None
+    kaeltepump_min: Optional[float] = None
+    kaeltepump_max: Optional[float] = None
+
+
+class InspectionAggregates(BaseModel):
+    dimension: str
+    total: Optional[InspectionAggregate] = None
+    groups: List[InspectionAggregate]
+
+
 class UserBase(BaseModel):
     username: str
     email: str
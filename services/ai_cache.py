@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+from expiringdict import ExpiringDict
+
+from services import ai_client
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of cached GPT responses per worker
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", 1024))
+# Seconds a cached GPT response stays valid
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", 3600))
+
+_responses = ExpiringDict(max_len=AI_CACHE_MAX_ENTRIES, max_age_seconds=AI_CACHE_TTL)
+stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+
+def _normalize(text: str) -> str:
+    """Collapse whitespace so that formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_key(messages: list, model: str, prompt_version: str) -> str:
+    payload = {
+        "model": model,
+        "prompt_version": prompt_version,
+        "messages": [{"role": m["role"], "content": _normalize(m["content"])} for m in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+async def chat_completion(messages: list, prompt_version: str, model: str = "gpt-4-turbo",
+                          bypass: bool = False):
+    """``ai_client.chat_completion`` memoized on (model, prompt version, normalized messages).
+
+    With ``bypass=True`` the cache is neither read nor written.
+    """
+    if bypass:
+        stats["bypassed"] += 1
+        return await ai_client.chat_completion(messages=messages, model=model)
+
+    key = make_key(messages, model, prompt_version)
+    response = _responses.get(key)
+    if response is not None:
+        stats["hits"] += 1
+        return response
+
+    stats["misses"] += 1
+    response = await ai_client.chat_completion(messages=messages, model=model)
+    _responses[key] = response
+    return response
+
+
+async def chat_completion_stream(messages: list, prompt_version: str, model: str = "gpt-4-turbo",
+                                 bypass: bool = False):
+    """Streaming variant of ``chat_completion``.
+
+    A cached answer is yielded in one piece; a streamed answer is cached once complete.
+    """
+    if bypass:
+        stats["bypassed"] += 1
+        async for content in ai_client.chat_completion_stream(messages=messages, model=model):
+            yield content
+        return
+
+    key = make_key(messages, model, prompt_version)
+    response = _responses.get(key)
+    if response is not None:
+        stats["hits"] += 1
+        yield response['choices'][0]['message']['content']
+        return
+
+    stats["misses"] += 1
+    pieces = []
+    async for content in ai_client.chat_completion_stream(messages=messages, model=model):
+        pieces.append(content)
+        yield content
+    _responses[key] = {"choices": [{"message": {"role": "assistant", "content": "".join(pieces)}}]}
+
+
+def get_stats() -> dict:
+    return {**stats, "entries": len(_responses)}
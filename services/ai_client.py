@@ -0,0 +1,133 @@
+import asyncio
+import os
+
+import aiohttp
+import openai
+from dotenv import load_dotenv
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from services import metrics
+
+# Load environment variables
+load_dotenv()
+openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Seconds a single OpenAI call (one attempt) may take
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+# Attempts per call, including the first one
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", 4))
+# OpenAI calls in flight per worker; further calls wait for a free slot
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 32))
+# Size of the shared HTTP connection pool
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", OPENAI_MAX_CONCURRENCY))
+
+_session = None
+_semaphore = None
+_loop = None
+
+
+def _bind_to_running_loop():
+    """Create the session and semaphore for the running event loop (once per loop)."""
+    global _session, _semaphore, _loop
+    loop = asyncio.get_running_loop()
+    if _loop is not loop or _session is None or _session.closed:
+        _session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=OPENAI_POOL_SIZE))
+        _semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+        _loop = loop
+
+
+async def close():
+    """Close the shared HTTP session (called when the app shuts down)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Retry on rate limits, timeouts, connection problems and 5xx responses."""
+    if isinstance(exc, (openai.error.RateLimitError, openai.error.ServiceUnavailableError,
+                        openai.error.Timeout, openai.error.APIConnectionError,
+                        openai.error.TryAgain, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, openai.error.APIError):
+        return exc.http_status is None or exc.http_status >= 500
+    return False
+
+
+async def _with_retries(request):
+    """Run ``request()`` on the shared session with a timeout and jittered retries."""
+    async for attempt in AsyncRetrying(retry=retry_if_exception(_is_retryable),
+                                       wait=wait_random_exponential(multiplier=0.5, max=20),
+                                       stop=stop_after_attempt(OPENAI_MAX_ATTEMPTS),
+                                       reraise=True):
+        with attempt:
+            # The openai library picks up the session from this context variable
+            openai.aiosession.set(_session)
+            return await asyncio.wait_for(request(), timeout=OPENAI_TIMEOUT)
+
+
+async def _acquire_slot():
+    """Wait for a free concurrency slot, counting the waiters for /metrics."""
+    _bind_to_running_loop()
+    with metrics.track("openai_slot_wait"):
+        await _semaphore.acquire()
+
+
+async def _call(operation: str, request):
+    """Like ``_with_retries``, but waits for a free concurrency slot first."""
+    await _acquire_slot()
+    try:
+        with metrics.track(f"openai_{operation}"):
+            response = await _with_retries(request)
+        metrics.OPENAI_CALLS.labels(operation, "ok").inc()
+        return response
+    except Exception:
+        metrics.OPENAI_CALLS.labels(operation, "error").inc()
+        raise
+    finally:
+        _semaphore.release()
+
+
+async def chat_completion(messages: list, model: str = "gpt-4-turbo", **params):
+    """Async replacement for ``openai.ChatCompletion.create``."""
+    response = await _call("chat", lambda: openai.ChatCompletion.acreate(model=model, messages=messages, **params))
+    metrics.record_usage(model, response)
+    return response
+
+
+async def chat_completion_stream(messages: list, model: str = "gpt-4-turbo", **params):
+    """Stream a chat completion, yielding the content pieces as they arrive.
+
+    Only opening the stream is retried; the concurrency slot is held until the stream ends.
+    """
+    await _acquire_slot()
+    try:
+        with metrics.track("openai_chat_stream"):
+            chunks = await _with_retries(
+                lambda: openai.ChatCompletion.acreate(model=model, messages=messages, stream=True, **params))
+            async for chunk in chunks:
+                content = chunk["choices"][0]["delta"].get("content") if chunk["choices"] else None
+                if content:
+                    # The stream carries no usage block; every content chunk is one completion token
+                    metrics.OPENAI_TOKENS.labels(model, "completion").inc()
+                    yield content
+        metrics.OPENAI_CALLS.labels("chat_stream", "ok").inc()
+    except Exception:
+        metrics.OPENAI_CALLS.labels("chat_stream", "error").inc()
+        raise
+    finally:
+        _semaphore.release()
+
+
+async def transcribe(audio, filename: str = "audio.wav", model: str = "whisper-1"):
+    """Async replacement for ``openai.Audio.transcribe``.
+
+    ``audio`` is either bytes or a binary file object, which is rewound before every attempt.
+    """
+    def request():
+        if hasattr(audio, "seek"):
+            audio.seek(0)
+        return openai.Audio.atranscribe_raw(model=model, file=audio, filename=filename)
+
+    return await _call("transcribe", request)
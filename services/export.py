@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+from db.database import sessionLocal
+from db import db_device
+
+# Load environment variables
+load_dotenv()
+
+# Rows fetched from the database (and written to Excel/Parquet) per batch
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+# Usernames (comma-separated) allowed to export the inspections of all users; nobody else may
+EXPORT_ADMIN_USERS = {name.strip() for name in os.getenv("EXPORT_ADMIN_USERS", "").split(",") if name.strip()}
+# Excel limit per sheet (including the header row); further rows continue on a new sheet
+EXCEL_MAX_ROWS = 1048576
+
+# Columns every export starts with; the flattened "data" fields follow
+FIXED_COLUMNS = ["id", "user_id", "created_at"]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", ".csv"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def flatten(data, prefix: str = "") -> dict:
+    """Flatten nested JSON into one level, joining keys with "." (lists become "key[0]", ...)."""
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = ((f"[{index}]", value) for index, value in enumerate(data))
+    else:
+        return {prefix or "value": data}
+
+    flat = {}
+    for key, value in items:
+        name = f"{prefix}{key}" if key.startswith("[") else (f"{prefix}.{key}" if prefix else key)
+        if isinstance(value, (dict, list)) and value:
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _flat_row(row) -> dict:
+    flat = {"id": row.id, "user_id": row.user_id,
+            "created_at": row.created_at.isoformat() if row.created_at else None}
+    for name, value in flatten(row.data or {}).items():
+        # A data field named like a fixed column must not overwrite it
+        flat.setdefault(name, value)
+    return flat
+
+
+def iter_batches(user_id=None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield the inspections as lists of flat row dicts, oldest first.
+
+    Every batch is a separate keyset query on a short-lived session, so neither
+    the rows nor a long read transaction are held while the caller writes.
+    """
+    after_id = None
+    while True:
+        db = sessionLocal()
+        try:
+            rows = db_device.get_device_inspection_rows(db, user_id=user_id, after_id=after_id, limit=batch_size)
+        finally:
+            db.close()
+        if not rows:
+            return
+        yield [_flat_row(row) for row in rows]
+        after_id = rows[-1].id
+        if len(rows) < batch_size:
+            return
+
+
+def scan_columns(user_id=None) -> dict:
+    """First pass for the formats that need a header: data column -> set of value types.
+
+    Memory grows with the number of distinct fields, not with the number of rows.
+    """
+    columns = {}
+    for batch in iter_batches(user_id):
+        for row in batch:
+            for name, value in row.items():
+                if name in FIXED_COLUMNS:
+                    continue
+                types = columns.setdefault(name, set())
+                if value is not None:
+                    types.add(type(value))
+    return columns
+
+
+def _cell(value):
+    """Scalars are written as they are, anything else (empty dicts/lists) as JSON."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def stream_csv(user_id=None):
+    """Generate the CSV export piece by piece (one chunk per batch)."""
+    columns = FIXED_COLUMNS + list(scan_columns(user_id))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for batch in iter_batches(user_id):
+        writer.writerows({name: _cell(value) for name, value in row.items()} for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(user_id=None):
+    """Generate the NDJSON export (one flat object per line); needs no first pass."""
+    for batch in iter_batches(user_id):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch)
+
+
+def write_xlsx(path: str, user_id=None):
+    """Write the Excel export to ``path`` with openpyxl's write-only (streaming) workbook."""
+    from openpyxl import Workbook
+
+    columns = FIXED_COLUMNS + list(scan_columns(user_id))
+    workbook = Workbook(write_only=True)
+    sheet, sheet_rows = None, EXCEL_MAX_ROWS
+    for batch in iter_batches(user_id):
+        for row in batch:
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(f"inspections{len(workbook.worksheets) + 1}")
+                sheet.append(columns)
+                sheet_rows = 1
+            sheet.append([_cell(row.get(name)) for name in columns])
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("inspections1").append(columns)
+    workbook.save(path)
+
+
+def _arrow_type(types: set):
+    import pyarrow as pa
+
+    if types and types <= {bool}:
+        return pa.bool_()
+    if types and types <= {int}:
+        return pa.int64()
+    if types and types <= {int, float}:
+        return pa.float64()
+    return pa.string()
+
+
+def write_parquet(path: str, user_id=None):
+    """Write the Parquet export to ``path``, one row group per batch.
+
+    Column types come from the first pass; fields with mixed types are stored as strings.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    data_columns = scan_columns(user_id)
+    schema = pa.schema([("id", pa.int64()), ("user_id", pa.int64()), ("created_at", pa.string())]
+                       + [(name, _arrow_type(types)) for name, types in data_columns.items()])
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in iter_batches(user_id):
+            arrays = []
+            for field in schema:
+                values = [row.get(field.name) for row in batch]
+                if field.type == pa.string():
+                    values = [value if value is None or isinstance(value, str)
+                              else json.dumps(value, ensure_ascii=False) for value in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def export_to_file(export_format: str, user_id=None) -> str:
+    """Write an Excel or Parquet export to a temporary file and return its path."""
+    suffix = EXPORT_FORMATS[export_format][1]
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    os.close(handle)
+    try:
+        if export_format == "xlsx":
+            write_xlsx(path, user_id)
+        else:
+            write_parquet(path, user_id)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import socket
+import sys
+
+from dotenv import load_dotenv
+
+from db.database import sessionLocal
+from db import db_job
+from db.writer import write_queue
+from services import form_pipeline
+
+# Load environment variables
+load_dotenv()
+
+# Forms processed concurrently by the batch workers of one server process
+FORM_JOB_WORKERS = int(os.getenv("FORM_JOB_WORKERS", 4))
+# Files that may wait in the queue; larger batches are rejected
+FORM_JOB_QUEUE_SIZE = int(os.getenv("FORM_JOB_QUEUE_SIZE", 200))
+
+_queue = None
+_workers = []
+_loop = None
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def owner() -> str:
+    """Identifies this server process in the jobs it queues (read per call: workers may be forked)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION; os.kill would terminate the process on Windows
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _orphaned(job_owner) -> bool:
+    """Whether the process that queued a job is gone. Jobs of other hosts are left to their own restart;
+    jobs from before owners were recorded count as orphaned."""
+    if not job_owner:
+        return True
+    host, _, pid = job_owner.rpartition(":")
+    if host != socket.gethostname():
+        return False
+    # A job carrying this process's own pid belongs to an earlier process that had the same pid
+    return int(pid) == os.getpid() or not _process_alive(int(pid))
+
+
+def fail_interrupted_jobs() -> int:
+    """Mark queued/running jobs whose server process has exited as failed, so their pollers finish.
+
+    Safe to call from every worker at startup: jobs of sibling workers that are still running stay untouched.
+    """
+    db = sessionLocal()
+    try:
+        job_ids = [job_id for job_id, job_owner in db_job.get_unfinished_form_jobs(db) if _orphaned(job_owner)]
+    finally:
+        db.close()
+    return write_queue.run(lambda write_db: db_job.fail_interrupted_form_jobs(write_db, job_ids))
+
+
+async def set_status(job_id: int, status: str, result: str = None, error: str = None):
+    await write_queue.run_async(lambda db: db_job.update_form_job(db, job_id, status, result=result, error=error))
+
+
+async def _worker():
+    while True:
+        job_id, data, filename, bypass_cache = await _queue.get()
+        try:
+            await set_status(job_id, "running")
+            form_fields, _ = await form_pipeline.extract_form_fields_shared(data, filename, bypass_cache=bypass_cache)
+            await set_status(job_id, "done", form_fields)
+        except Exception as e:
+            print(f"Error in batch job {job_id}:", e)
+            await set_status(job_id, "failed", None, str(e))
+        finally:
+            _queue.task_done()
+
+
+def _ensure_started():
+    """Start the queue and its worker tasks on the running event loop (once per loop)."""
+    global _queue, _workers, _loop
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        _queue = asyncio.Queue(maxsize=FORM_JOB_QUEUE_SIZE)
+        _workers = [loop.create_task(_worker()) for _ in range(FORM_JOB_WORKERS)]
+        _loop = loop
+
+
+def free_slots() -> int:
+    _ensure_started()
+    return _queue.maxsize - _queue.qsize()
+
+
+def queued() -> int:
+    """Files currently waiting for a batch worker."""
+    return _queue.qsize() if _queue is not None else 0
+
+
+def enqueue(jobs: list, bypass_cache: bool = False):
+    """Queue ``(job_id, data, filename)`` tuples; all or nothing."""
+    if len(jobs) > free_slots():
+        raise QueueFullError("batch queue is full, try again later")
+    for job_id, data, filename in jobs:
+        _queue.put_nowait((job_id, data, filename, bypass_cache))
+
+
+async def stop():
+    """Cancel the worker tasks (called when the app shuts down)."""
+    global _workers, _loop
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers = []
+    _loop = None
@@ -0,0 +1,84 @@
+import os
+
+from starlette.concurrency import run_in_threadpool
+
+from services import ocr_cache, ai_cache, form_registry, metrics, prompt_budget, single_flight
+
+# Prompt versions are part of the GPT response cache key; bump them whenever a prompt changes
+FIELD_EXTRACTION_PROMPT_VERSION = "1"
+
+# Identical uploads processed at the same time (double submits, a crew uploading the same form) share one run
+form_flights = single_flight.SingleFlight("process_form")
+
+
+async def extract_form_fields(data: bytes, filename: str, bypass_cache: bool = False, report: dict = None) -> str:
+    """OCR an uploaded form and let GPT pick out the user-interactive fields.
+
+    Forms whose labels match a known layout are answered from the template registry
+    without GPT; with ``bypass_cache`` the registry entry is recomputed instead. If GPT
+    is asked, the prompt trimming figures (see prompt_budget.trim) are added to ``report``.
+    """
+    # Run OCR in the worker pool (PDF pages are processed in parallel), unless the file is cached
+    # or a digital PDF brings its own text layer
+    with metrics.track("ocr"):
+        extracted_text = await ocr_cache.extract_text(data, filename)
+
+    labels = None
+    if form_registry.FORM_TEMPLATES_ENABLED:
+        labels = form_registry.form_labels(extracted_text)
+        if not bypass_cache:
+            with metrics.track("template_lookup"):
+                form_fields = await form_registry.lookup(labels)
+            if form_fields is not None:
+                return form_fields
+
+    # Drop repeated headers, prose and overflow so that only the form's labels reach GPT
+    with metrics.track("prompt_trim"):
+        # In a thread: tokenizing long texts (and loading the tokenizer the first time) takes a while
+        prompt_text, trim_report = await run_in_threadpool(prompt_budget.trim, extracted_text)
+    metrics.PROMPT_TOKENS.labels("original").inc(trim_report["original_tokens"])
+    metrics.PROMPT_TOKENS.labels("sent").inc(trim_report["prompt_tokens"])
+    metrics.PROMPT_REDUCTION.observe(trim_report["reduction"])
+    if report is not None:
+        report.update(trim_report)
+
+    # Use OpenAI to extract form fields (memoized per OCR text)
+    with metrics.track("gpt_field_extraction"):
+        openai_response = await ai_cache.chat_completion(
+            model="gpt-4-turbo",
+            messages=[
+                {"role": "system", "content": "Extract all user-interactive form fields..."},
+                {"role": "user", "content": prompt_text}
+            ],
+            prompt_version=FIELD_EXTRACTION_PROMPT_VERSION,
+            bypass=bypass_cache
+        )
+
+    form_fields = openai_response['choices'][0]['message']['content']
+    print("Extracted text:", extracted_text[:500])
+    print("OpenAI response:", form_fields)
+
+    if labels is not None:
+        with metrics.track("template_register"):
+            await form_registry.register(labels, form_fields)
+    return form_fields
+
+
+async def extract_form_fields_shared(data: bytes, filename: str, bypass_cache: bool = False):
+    """``extract_form_fields`` for an upload, joined with an identical upload already being processed.
+
+    Returns ``(form_fields, report)``; callers get their own copy of the report.
+    """
+    # Hashing a multi-MB PDF would block the event loop
+    with metrics.track("upload_hash"):
+        content_hash = await run_in_threadpool(single_flight.content_hash, data)
+    # The extension decides between PDF and image OCR, so it is part of the key
+    key = (content_hash, os.path.splitext(filename)[1].lower(), bypass_cache)
+
+    async def compute():
+        report = {}
+        form_fields = await extract_form_fields(data, filename, bypass_cache=bypass_cache, report=report)
+        return form_fields, report
+
+    form_fields, report = await form_flights.run(key, compute)
+    return form_fields, dict(report)
@@ -0,0 +1,112 @@
+import math
+import os
+import re
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from db.database import sessionLocal
+from db import db_form_template
+from db.writer import write_queue
+from services import prompt_budget
+
+# Load environment variables
+load_dotenv()
+
+# Known form layouts are answered from the registry instead of GPT
+FORM_TEMPLATES_ENABLED = os.getenv("FORM_TEMPLATES_ENABLED", "true").lower() in ("1", "true", "yes")
+# Share of field labels two texts must have in common (Jaccard similarity) to count as the same layout
+FORM_TEMPLATE_MIN_SIMILARITY = float(os.getenv("FORM_TEMPLATE_MIN_SIMILARITY", 0.85))
+# Texts with fewer labels than this are too unspecific to be matched (or registered)
+FORM_TEMPLATE_MIN_LABELS = int(os.getenv("FORM_TEMPLATE_MIN_LABELS", 4))
+
+# Header under which ocr.extract_text lists the AcroForm field names of fillable PDFs
+ACROFORM_HEADER = "Form fields (AcroForm):"
+
+stats = {"hits": 0, "misses": 0, "registered": 0}
+
+
+def _label_key(label: str) -> str:
+    """Letters only, lowercased: OCR noise in digits, punctuation and spacing does not split a label."""
+    return " ".join(re.findall(r"[^\W\d_]+", label.lower()))
+
+
+def form_labels(text: str) -> list:
+    """The field labels of a form text: the part before the colon, blanks and checkboxes of label-like lines.
+
+    Values filled into a form mostly follow the colon or replace the blanks, so a filled-in copy of a form
+    yields (nearly) the same labels as the blank one, while a different layout does not.
+    """
+    text, _, acroform = text.partition(ACROFORM_HEADER)
+    labels = set()
+    for line in text.splitlines():
+        if not prompt_budget.is_label(line):
+            continue
+        label = line.split(":", 1)[0] if ":" in line else prompt_budget.FIELD_PATTERN.sub(" ", line)
+        key = _label_key(label)
+        if key:
+            labels.add(key)
+    for line in acroform.splitlines():
+        key = _label_key(line.lstrip("- "))
+        if key:
+            labels.add("acroform " + key)
+    return sorted(labels)
+
+
+def similarity(a: list, b: list) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def _closest_template(db, labels: list):
+    # Jaccard similarity t needs t·n <= m <= n/t labels on the other side; only those templates are compared
+    count = len(labels)
+    candidates = db_form_template.get_form_templates(db, math.ceil(count * FORM_TEMPLATE_MIN_SIMILARITY),
+                                                     math.floor(count / FORM_TEMPLATE_MIN_SIMILARITY))
+    best, best_similarity = None, FORM_TEMPLATE_MIN_SIMILARITY
+    for template in candidates:
+        score = similarity(labels, template.labels)
+        if score >= best_similarity:
+            best, best_similarity = template, score
+    return best
+
+
+def _lookup(labels: list):
+    db = sessionLocal()
+    try:
+        template = _closest_template(db, labels)
+        return None if template is None else (template.id, template.fields)
+    finally:
+        db.close()
+
+
+def _register(db, labels: list, fields: str):
+    # Runs on the writer thread, so two uploads of a new layout cannot both create a template
+    template = _closest_template(db, labels)
+    if template is None:
+        db_form_template.create_form_template(db, labels, fields)
+    else:
+        db_form_template.update_form_template_fields(db, template.id, fields)
+
+
+async def lookup(labels: list):
+    """Return the fields of the registered layout with (nearly) the same labels, or None."""
+    if len(labels) < FORM_TEMPLATE_MIN_LABELS:
+        return None
+    match = await run_in_threadpool(_lookup, labels)
+    if match is None:
+        stats["misses"] += 1
+        return None
+    template_id, fields = match
+    stats["hits"] += 1
+    # Queued without waiting; the hit counter is only shown in the template overview
+    write_queue.submit(lambda db: db_form_template.record_form_template_hit(db, template_id))
+    return fields
+
+
+async def register(labels: list, fields: str):
+    """Store the fields of a newly processed layout (or refresh those of a matching one)."""
+    if len(labels) < FORM_TEMPLATE_MIN_LABELS:
+        return
+    await write_queue.run_async(lambda db: _register(db, labels, fields))
+    stats["registered"] += 1
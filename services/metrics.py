@@ -0,0 +1,129 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Pipeline stages range from milliseconds (cache lookups) to minutes (multi-page OCR, slow GPT answers)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+STAGE_SECONDS = Histogram("testo_stage_duration_seconds", "Duration of one pipeline stage",
+                          ["stage"], buckets=STAGE_BUCKETS)
+STAGE_IN_FLIGHT = Gauge("testo_stage_in_flight", "Pipeline stages currently running",
+                        ["stage"], multiprocess_mode="livesum")
+STAGE_ERRORS = Counter("testo_stage_errors_total", "Pipeline stages that raised an exception", ["stage"])
+REQUESTS = Counter("testo_requests_total", "Requests to the AI endpoints by outcome", ["endpoint", "outcome"])
+OCR_PAGES = Counter("testo_ocr_pages_total", "Pages (PDF pages or images) recognized by Tesseract")
+TEXT_LAYER_PAGES = Counter("testo_pdf_text_layer_pages_total", "PDF pages read from the embedded text layer (no OCR)")
+COALESCED_REQUESTS = Counter("testo_coalesced_requests_total",
+                             "Requests that joined an identical computation already in flight", ["pipeline"])
+OPENAI_CALLS = Counter("testo_openai_calls_total", "OpenAI API calls by outcome", ["operation", "outcome"])
+OPENAI_TOKENS = Counter("testo_openai_tokens_total", "Tokens sent to (prompt) and received from (completion) OpenAI",
+                        ["model", "kind"])
+PROMPT_TOKENS = Counter("testo_prompt_trim_tokens_total",
+                        "OCR text tokens before (original) and after (sent) prompt trimming", ["kind"])
+PROMPT_REDUCTION = Histogram("testo_prompt_reduction_ratio", "Share of OCR text tokens removed before field extraction",
+                             buckets=(0, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1))
+DB_QUERY_SECONDS = Histogram("testo_db_query_duration_seconds", "Duration of one SQL statement",
+                             ["statement"], buckets=DB_BUCKETS)
+DB_WRITE_BATCH_SIZE = Histogram("testo_db_write_batch_size", "Jobs committed together by the write queue",
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+@contextmanager
+def track(stage: str):
+    """Time a block as ``stage`` and count it as in flight while it runs."""
+    in_flight = STAGE_IN_FLIGHT.labels(stage)
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+        in_flight.dec()
+
+
+def observe(stage: str, seconds: float):
+    """Record a stage that was timed elsewhere (e.g. inside an OCR worker process)."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def record_usage(model: str, response):
+    """Count the tokens reported in the ``usage`` block of a chat completion."""
+    usage = response.get("usage") if hasattr(response, "get") else None
+    if usage:
+        OPENAI_TOKENS.labels(model, "prompt").inc(usage.get("prompt_tokens", 0))
+        OPENAI_TOKENS.labels(model, "completion").inc(usage.get("completion_tokens", 0))
+
+
+def instrument_engine(engine):
+    """Time every SQL statement executed through ``engine`` (sync engine or ``async_engine.sync_engine``)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(verb).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+class _StatsCollector:
+    """Exposes the counters the caches and queues already keep, read at scrape time."""
+
+    def describe(self):
+        # Nothing to check at registration; also keeps register() from importing the services early
+        return []
+
+    def collect(self):
+        from db.writer import write_queue
+        from services import ai_cache, form_jobs, form_registry, ocr_cache
+
+        hits = CounterMetricFamily("testo_cache_requests", "Cache lookups by cache and result", labels=["cache", "result"])
+        for result, value in ocr_cache.ocr_cache.stats.items():
+            hits.add_metric(["ocr", result], value)
+        for result, value in ai_cache.stats.items():
+            hits.add_metric(["gpt", result], value)
+        for result, value in form_registry.stats.items():
+            hits.add_metric(["form_template", result], value)
+        yield hits
+
+        depth = GaugeMetricFamily("testo_queue_depth", "Jobs waiting in a queue", labels=["queue"])
+        depth.add_metric(["db_write"], write_queue.depth())
+        depth.add_metric(["form_jobs"], form_jobs.queued())
+        yield depth
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def render() -> bytes:
+    """All metrics in the Prometheus text format.
+
+    With several uvicorn workers, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty directory so that every
+    worker's histograms and counters are merged; the cache and queue figures are those of the worker
+    that answers the scrape.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_StatsCollector())
+    return generate_latest(registry)
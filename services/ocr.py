@@ -0,0 +1,211 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+from PIL import Image
+from pypdf import PdfReader
+
+from services import metrics, ocr_engine, ocr_preprocess
+
+# Load environment variables
+load_dotenv()
+
+# Number of worker processes that rasterize and OCR pages (defaults to one per core)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+
+# Use the embedded text layer of digitally generated PDFs and OCR only pages without usable text
+PDF_TEXT_LAYER = os.getenv("PDF_TEXT_LAYER", "true").lower() in ("1", "true", "yes")
+# Fewer characters than this on a page (e.g. only a scanned image with a page number) means: OCR the page
+PDF_TEXT_MIN_CHARS = int(os.getenv("PDF_TEXT_MIN_CHARS", 20))
+# Fewer characters per square inch of page means: the text is only a stamp (e.g. "Seite 1 von 3") on a scan
+PDF_TEXT_MIN_DENSITY = float(os.getenv("PDF_TEXT_MIN_DENSITY", 1.0))
+# An embedded image with at least this many pixels is a scanned page (a logo is far smaller)
+PDF_SCAN_MIN_PIXELS = int(os.getenv("PDF_SCAN_MIN_PIXELS", 1_000_000))
+
+# Separates the pages of a PDF in the extracted text (form feed, as Tesseract ends its pages)
+PAGE_SEPARATOR = "\f"
+
+# Resolution used when rasterizing PDF pages (pdf2image default)
+PDF_DPI = int(os.getenv("PDF_DPI", 200))
+# Tesseract page segmentation mode (e.g. 6 = one uniform block, 11 = sparse text); empty = Tesseract default
+OCR_PSM = os.getenv("OCR_PSM", "")
+# Tesseract language(s), e.g. "deu+eng" (the traineddata files must be installed)
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+
+_executor = None
+# Tesseract engine of a worker process, created on its first page and kept for the following ones
+_engine = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Return the shared OCR process pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        # "spawn" keeps the workers independent of the server's threads and event loop
+        _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown():
+    """Stop the OCR process pool (called when the app shuts down)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def cache_settings() -> dict:
+    """Settings that influence the recognized text; part of the OCR cache key."""
+    return {"engine": ocr_engine.resolve(), "page_separator": PAGE_SEPARATOR,
+            "pdf_dpi": PDF_DPI, "psm": OCR_PSM, "lang": OCR_LANG,
+            "pdf_text_layer": PDF_TEXT_LAYER, "pdf_text_min_chars": PDF_TEXT_MIN_CHARS,
+            "pdf_text_min_density": PDF_TEXT_MIN_DENSITY, "pdf_scan_min_pixels": PDF_SCAN_MIN_PIXELS,
+            **ocr_preprocess.settings()}
+
+
+# --- Worker functions (executed inside the pool processes) ---
+
+def _pdf_page_count(data: bytes) -> int:
+    return pdfinfo_from_bytes(data)["Pages"]
+
+
+def _usable_text(text: str, page=None) -> bool:
+    """Trust the text layer of a page only if it is not a scan.
+
+    Scans carry no text, only noise, or a stamped header/footer on top of a page-sized
+    image; such pages have few characters for their area or embed a large image.
+    """
+    printable = sum(1 for char in text if char.isprintable() and not char.isspace())
+    if printable < PDF_TEXT_MIN_CHARS:
+        return False
+    if page is None:
+        return True
+    box = page.mediabox
+    square_inches = float(box.width) * float(box.height) / (72 * 72)
+    if square_inches and printable / square_inches < PDF_TEXT_MIN_DENSITY:
+        return False
+    return not _has_scanned_image(page)
+
+
+def _has_scanned_image(page) -> bool:
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjects is None:
+        return False
+    for xobject in xobjects.get_object().values():
+        xobject = xobject.get_object()
+        if xobject.get("/Subtype") == "/Image" and \
+                int(xobject.get("/Width", 0)) * int(xobject.get("/Height", 0)) >= PDF_SCAN_MIN_PIXELS:
+            return True
+    return False
+
+
+def _pdf_text_layer(data: bytes):
+    """Read the embedded text of every page and the names of the AcroForm fields.
+
+    Returns ``(pages, field_names)`` where a page is ``None`` if it needs OCR,
+    or ``None`` if the PDF cannot be read without rasterizing it.
+    """
+    started = time.perf_counter()
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        if reader.is_encrypted:
+            reader.decrypt("")
+        pages = []
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            pages.append(text if _usable_text(text, page) else None)
+        field_names = list((reader.get_fields() or {}).keys())
+    except Exception:
+        return None, time.perf_counter() - started
+    return (pages, field_names), time.perf_counter() - started
+
+
+# Worker functions also return how long each step took ({stage: seconds}), for /metrics in the server process
+
+def _get_engine():
+    global _engine
+    if _engine is None:
+        _engine = ocr_engine.create(OCR_LANG, OCR_PSM)
+    return _engine
+
+
+def _recognize(image: Image.Image, timings: dict) -> str:
+    started = time.perf_counter()
+    image = ocr_preprocess.preprocess(image)
+    preprocessed = time.perf_counter()
+    text = _get_engine().recognize(image)
+    timings["ocr_preprocess"] = timings.get("ocr_preprocess", 0) + preprocessed - started
+    timings["tesseract"] = timings.get("tesseract", 0) + time.perf_counter() - preprocessed
+    return text
+
+
+def _ocr_pdf_page(data: bytes, page_number: int):
+    started = time.perf_counter()
+    images = convert_from_bytes(data, dpi=PDF_DPI, first_page=page_number, last_page=page_number)
+    timings = {"pdf_rasterize": time.perf_counter() - started}
+    text = "\n".join(_recognize(img, timings) for img in images)
+    return text, timings
+
+
+def _ocr_image(data: bytes):
+    timings = {}
+    text = _recognize(Image.open(io.BytesIO(data)), timings)
+    return text, timings
+
+
+async def extract_text(data: bytes, filename: str) -> str:
+    """OCR an uploaded PDF or image in the process pool without blocking the event loop.
+
+    PDFs with an embedded text layer are read directly; only pages without
+    usable text are rasterized and recognized, concurrently, one task per page.
+    The text is joined back together in page order, pages separated by PAGE_SEPARATOR.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+
+    if filename.lower().endswith(".pdf"):
+        text_layer = None
+        if PDF_TEXT_LAYER:
+            text_layer, seconds = await loop.run_in_executor(executor, _pdf_text_layer, data)
+            metrics.observe("pdf_text_layer", seconds)
+
+        if text_layer is None:
+            with metrics.track("pdf_page_count"):
+                page_count = await loop.run_in_executor(executor, _pdf_page_count, data)
+            pages, field_names = [None] * page_count, []
+        else:
+            pages, field_names = text_layer
+            metrics.TEXT_LAYER_PAGES.inc(sum(page is not None for page in pages))
+
+        # Rasterize and OCR only the pages without usable embedded text
+        missing = [index for index, page in enumerate(pages) if page is None]
+        if missing:
+            with metrics.track("ocr_pages"):
+                results = await asyncio.gather(*[
+                    loop.run_in_executor(executor, _ocr_pdf_page, data, index + 1) for index in missing
+                ])
+            for index, (text, timings) in zip(missing, results):
+                pages[index] = text
+                for stage, seconds in timings.items():
+                    metrics.observe(stage, seconds)
+            metrics.OCR_PAGES.inc(len(missing))
+
+        text = PAGE_SEPARATOR.join(pages)
+        if field_names:
+            # Fillable PDFs name their fields exactly; hand the names to GPT along with the page text
+            text += "\n\nForm fields (AcroForm):\n" + "\n".join(f"- {name}" for name in field_names)
+        return text
+
+    with metrics.track("ocr_pages"):
+        text, timings = await loop.run_in_executor(executor, _ocr_image, data)
+    for stage, seconds in timings.items():
+        metrics.observe(stage, seconds)
+    metrics.OCR_PAGES.inc()
+    return text
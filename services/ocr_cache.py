@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from db.database import sessionLocal
+from db import db_ocr_cache
+from db.writer import write_queue
+from services import ocr
+
+# Load environment variables
+load_dotenv()
+
+# Entries kept in the per-process memory tier
+OCR_CACHE_MEMORY_ENTRIES = int(os.getenv("OCR_CACHE_MEMORY_ENTRIES", 256))
+# Upper bound for the text stored in the shared SQLite tier
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+# A disk hit refreshes the entry's last use (for eviction) only if it is older than this many seconds,
+# so that hits stay read-only
+OCR_CACHE_TOUCH_SECONDS = 60
+
+
+class OcrCache:
+    """Two-tier cache for OCR results keyed on the uploaded bytes.
+
+    The memory tier is a per-process LRU; the SQLite tier lives in the
+    application database and is shared by all uvicorn workers.
+    """
+
+    def __init__(self, memory_entries: int, max_bytes: int):
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(data: bytes, filename: str) -> str:
+        """Hash the file content together with every setting that changes the OCR output."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"suffix": os.path.splitext(filename)[1].lower(),
+                                  **ocr.cache_settings()}, sort_keys=True).encode("utf-8"))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _remember(self, key: str, text: str):
+        with self._lock:
+            self._memory[key] = text
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return text
+
+        db = sessionLocal()
+        try:
+            entry = db_ocr_cache.get_ocr_text(db, key)
+        finally:
+            db.close()
+
+        if entry is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        text, last_used = entry
+        if last_used is None or time.time() - last_used > OCR_CACHE_TOUCH_SECONDS:
+            # Queued without waiting; the writer commits it together with other pending writes
+            write_queue.submit(lambda db: db_ocr_cache.touch_ocr_entry(db, key))
+        with self._lock:
+            self.stats["disk_hits"] += 1
+        self._remember(key, text)
+        return text
+
+    def _save(self, db, key: str, text: str):
+        db_ocr_cache.save_ocr_text(db, key, text)
+        db_ocr_cache.evict_ocr_entries(db, self.max_bytes)
+
+    def put(self, key: str, text: str):
+        self._remember(key, text)
+        write_queue.run(lambda db: self._save(db, key, text))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "memory_entries": len(self._memory)}
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+ocr_cache = OcrCache(OCR_CACHE_MEMORY_ENTRIES, OCR_CACHE_MAX_BYTES)
+
+
+async def extract_text(data: bytes, filename: str) -> str:
+    """Return the OCR text for an upload, running OCR only on a cache miss."""
+    key = await run_in_threadpool(ocr_cache.make_key, data, filename)
+    text = await run_in_threadpool(ocr_cache.get, key)
+    if text is None:
+        text = await ocr.extract_text(data, filename)
+        await run_in_threadpool(ocr_cache.put, key, text)
+    return text
@@ -0,0 +1,81 @@
+import functools
+import importlib.util
+import os
+
+import pytesseract
+from dotenv import load_dotenv
+from PIL import Image
+
+# Load environment variables
+load_dotenv()
+
+# "tesserocr" keeps Tesseract loaded in every OCR worker, "pytesseract" starts the tesseract program per page,
+# "auto" uses tesserocr if it is installed
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto").lower()
+# Path of the tesseract program for the pytesseract engine, if it is not on PATH
+# (e.g. C:\Program Files\Tesseract-OCR\tesseract.exe on Windows)
+TESSERACT_CMD = os.getenv("TESSERACT_CMD")
+
+if TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+
+@functools.lru_cache(maxsize=None)
+def resolve(name: str = OCR_ENGINE) -> str:
+    """Name of the engine that ``name`` selects; part of the OCR cache key."""
+    if name == "auto":
+        return "tesserocr" if importlib.util.find_spec("tesserocr") is not None else "pytesseract"
+    if name not in ("tesserocr", "pytesseract"):
+        raise ValueError(f"Unknown OCR_ENGINE {name!r} (expected auto, tesserocr or pytesseract)")
+    return name
+
+
+class PytesseractEngine:
+    """Runs the tesseract program for every image (temp file in, text out)."""
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str, psm: str):
+        self.lang = lang
+        self.config = f"--psm {psm}" if psm else ""
+
+    def recognize(self, image: Image.Image) -> str:
+        return pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """Keeps one Tesseract API (with its language model loaded) and hands it images from memory."""
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str, psm: str):
+        import tesserocr
+
+        options = {"lang": lang}
+        if psm:
+            options["psm"] = int(psm)
+        self.api = tesserocr.PyTessBaseAPI(**options)
+
+    def recognize(self, image: Image.Image) -> str:
+        self.api.SetImage(image)
+        return self.api.GetUTF8Text()
+
+    def close(self):
+        self.api.End()
+
+
+ENGINES = {"pytesseract": PytesseractEngine, "tesserocr": TesserocrEngine}
+
+
+def create(lang: str, psm: str, name: str = OCR_ENGINE):
+    """Create the configured engine; with "auto", a tesserocr that cannot start falls back to pytesseract."""
+    try:
+        return ENGINES[resolve(name)](lang, psm)
+    except RuntimeError:
+        # tesserocr raises RuntimeError when it finds no language data for ``lang``
+        if name != "auto":
+            raise
+        return PytesseractEngine(lang, psm)
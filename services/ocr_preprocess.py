@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+
+# Load environment variables
+load_dotenv()
+
+# Master switch for the steps below; off hands the raw page image to Tesseract as before
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "true").lower() in ("1", "true", "yes")
+# Resolution Tesseract works best at; larger images (phone photos) are scaled down to it, never up
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+# "otsu" binarizes with an automatic threshold, "none" keeps grayscale
+OCR_THRESHOLD = os.getenv("OCR_THRESHOLD", "otsu").lower()
+# Straighten pages that are rotated by up to this many degrees (0 disables deskewing)
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 5))
+# Crop white margins, keeping this many pixels around the content (-1 disables cropping)
+OCR_CROP_PADDING = int(os.getenv("OCR_CROP_PADDING", 20))
+
+# Long edge of an A4 page in inches; photos carry no reliable DPI, so the size is judged against A4
+A4_LONG_EDGE_INCHES = 11.69
+# Deskewing searches angles on a copy of at most this size, first in whole degrees, then in fine steps
+DESKEW_SAMPLE_SIZE = 800
+DESKEW_FINE_STEP = 0.25
+
+
+def settings() -> dict:
+    """Preprocessing settings; part of the OCR cache key."""
+    if not OCR_PREPROCESS:
+        return {"preprocess": False}
+    return {"preprocess": True, "target_dpi": OCR_TARGET_DPI, "threshold": OCR_THRESHOLD,
+            "deskew_max_angle": OCR_DESKEW_MAX_ANGLE, "crop_padding": OCR_CROP_PADDING}
+
+
+def _target_size(image: Image.Image):
+    """Size of an image larger than an A4 page at OCR_TARGET_DPI after scaling down, else None."""
+    scale = A4_LONG_EDGE_INCHES * OCR_TARGET_DPI / max(image.size)
+    if scale >= 1:
+        return None
+    return max(1, round(image.width * scale)), max(1, round(image.height * scale))
+
+
+def downscale(image: Image.Image) -> Image.Image:
+    """Shrink images larger than an A4 page at OCR_TARGET_DPI; smaller ones are left alone."""
+    size = _target_size(image)
+    if size is None:
+        return image
+    if getattr(image, "format", None) == "JPEG":
+        # Let the JPEG decoder skip the detail we would throw away anyway (much faster for phone photos)
+        image.draft("RGB", size)
+        size = _target_size(image)
+        if size is None:
+            return image
+    return image.resize(size, Image.LANCZOS)
+
+
+def otsu_threshold(gray: Image.Image) -> int:
+    """Threshold that best separates the dark (ink) and light (paper) pixel populations."""
+    histogram = np.array(gray.histogram()[:256], dtype=np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(histogram * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_dark = sum_dark / weight_dark
+        mean_light = (sum_dark[-1] - sum_dark) / weight_light
+        between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.nanargmax(between))
+
+
+def binarize(gray: Image.Image) -> Image.Image:
+    threshold = otsu_threshold(gray)
+    return gray.point(lambda value: 255 if value > threshold else 0)
+
+
+def skew_angle(gray: Image.Image) -> float:
+    """Rotation (degrees) that makes the text lines horizontal.
+
+    Text lines produce the sharpest row profile (highest variance of the ink
+    per row) when they are level; the candidates are tried on a small copy.
+    """
+    sample = gray.copy()
+    sample.thumbnail((DESKEW_SAMPLE_SIZE, DESKEW_SAMPLE_SIZE))
+    ink = ImageOps.invert(sample)
+
+    def score(angle: float) -> float:
+        rows = np.asarray(ink.rotate(angle, resample=Image.BILINEAR, fillcolor=0), dtype=np.float64).sum(axis=1)
+        return rows.var()
+
+    limit = int(OCR_DESKEW_MAX_ANGLE)
+    coarse = max(range(-limit, limit + 1), key=score)
+    fine_steps = int(1 / DESKEW_FINE_STEP)
+    candidates = [coarse + step * DESKEW_FINE_STEP for step in range(-fine_steps + 1, fine_steps)]
+    return max((angle for angle in candidates if abs(angle) <= OCR_DESKEW_MAX_ANGLE), key=score)
+
+
+def crop_margins(image: Image.Image) -> Image.Image:
+    # Only clearly dark pixels count as content, so paper texture does not defeat the crop
+    bbox = image.point(lambda value: 255 if value < 128 else 0).getbbox()
+    if bbox is None:
+        return image
+    left, top, right, bottom = bbox
+    padding = OCR_CROP_PADDING
+    return image.crop((max(0, left - padding), max(0, top - padding),
+                       min(image.width, right + padding), min(image.height, bottom + padding)))
+
+
+def preprocess(image: Image.Image) -> Image.Image:
+    """Prepare a page image for Tesseract: orient, downscale, grayscale, deskew, binarize, crop."""
+    if not OCR_PREPROCESS:
+        return image
+    gray = ImageOps.exif_transpose(downscale(image)).convert("L")
+    if OCR_DESKEW_MAX_ANGLE > 0:
+        angle = skew_angle(gray)
+        if angle:
+            gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if OCR_THRESHOLD == "otsu":
+        gray = binarize(gray)
+    if OCR_CROP_PADDING >= 0:
+        gray = crop_margins(gray)
+    return gray
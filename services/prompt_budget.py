@@ -0,0 +1,162 @@
+import math
+import os
+import re
+
+from dotenv import load_dotenv
+
+from services.ocr import PAGE_SEPARATOR
+
+# Load environment variables
+load_dotenv()
+
+# Reduce the OCR text before it is sent to GPT; off sends it unchanged
+PROMPT_TRIM = os.getenv("PROMPT_TRIM", "true").lower() in ("1", "true", "yes")
+# Upper limit for the OCR text of one form in tokens (0 = no limit)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 3000))
+# Paragraphs with at least this many words in long non-label lines are prose (terms, legal notes);
+# those lines are dropped, labels and short lines (headings, checklist items) of the paragraph stay
+PROMPT_PROSE_MIN_WORDS = int(os.getenv("PROMPT_PROSE_MIN_WORDS", 30))
+# Model whose tokenizer counts the budget
+PROMPT_TOKENIZER_MODEL = os.getenv("PROMPT_TOKENIZER_MODEL", "gpt-4-turbo")
+# Seconds the server start waits for the tokenizer (tiktoken downloads it on first use); until it is loaded,
+# tokens are estimated
+PROMPT_TOKENIZER_LOAD_TIMEOUT = float(os.getenv("PROMPT_TOKENIZER_LOAD_TIMEOUT", 10))
+
+# Lines that look like a form field: blanks (____ or ....) and checkboxes, or a short "Label:" line
+FIELD_PATTERN = re.compile(r"_{2,}|\.{4,}|[☐☑☒□■▢○●◯]|\[\s*[xX]?\s*\]|\(\s*[xX]?\s*\)")
+LABEL_MAX_WORDS = 12
+# Lines with at least this many words and no label count as running text
+PROSE_LINE_MIN_WORDS = 8
+# Lines this close to the top or bottom of a page are candidates for running headers and footers
+PAGE_EDGE_LINES = 3
+
+
+# Set by load_encoding; requests never load it themselves, since the download has no timeout
+_encoding = None
+
+
+def load_encoding() -> bool:
+    """Load the tiktoken encoding (called once at server start); False if tiktoken is missing or cannot load it."""
+    global _encoding
+    try:
+        import tiktoken
+        _encoding = tiktoken.encoding_for_model(PROMPT_TOKENIZER_MODEL)
+    except Exception:
+        return False
+    return True
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding
+    if encoding is None:
+        # Rule of thumb for GPT tokenizers: about four characters per token
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def is_label(line: str) -> bool:
+    if FIELD_PATTERN.search(line):
+        return True
+    # A colon in a long sentence ("Haftung: Die nachfolgenden Bedingungen ...") does not make a label
+    return ":" in line and len(line.split()) <= LABEL_MAX_WORDS
+
+
+def _edge_key(line: str) -> str:
+    """Header/footer identity: case, spacing and numbers (page numbers, dates) do not matter."""
+    return re.sub(r"\d+", "#", " ".join(line.split()).lower())
+
+
+def _page_edges(lines: list) -> list:
+    """Positions of the first and last PAGE_EDGE_LINES non-empty lines of a page."""
+    filled = [position for position, line in enumerate(lines) if line.strip()]
+    return sorted(set(filled[:PAGE_EDGE_LINES] + filled[-PAGE_EDGE_LINES:]))
+
+
+def _paragraphs(lines: list) -> list:
+    """Group lines into paragraphs separated by blank lines."""
+    paragraphs, current = [], []
+    for line in lines:
+        if line.strip():
+            current.append(line)
+        elif current:
+            paragraphs.append(current)
+            current = []
+    if current:
+        paragraphs.append(current)
+    return paragraphs
+
+
+def trim(text: str):
+    """Shrink OCR text for the field extraction prompt.
+
+    Drops running headers and footers (non-label lines that recur at the top or
+    bottom of several pages; the first occurrence stays), the running text of
+    prose paragraphs, and finally non-label lines from the end (then any lines
+    from the end) until the text fits PROMPT_TOKEN_BUDGET. Lines that look like
+    form fields are never treated as headers or footers, however often they repeat.
+    Returns ``(text, report)``; the report holds the token counts before and
+    after, the reduction ratio and the number of dropped lines per reason.
+    """
+    original_tokens = count_tokens(text)
+    report = {"original_tokens": original_tokens, "prompt_tokens": original_tokens, "reduction": 0.0,
+              "dropped_lines": {"duplicate": 0, "prose": 0, "budget": 0}}
+    if not PROMPT_TRIM or not text.strip():
+        return text.replace(PAGE_SEPARATOR, "\n"), report
+    dropped = report["dropped_lines"]
+
+    pages = [page.splitlines() for page in text.split(PAGE_SEPARATOR) if page.strip()]
+    edge_pages = {}
+    for number, page in enumerate(pages):
+        for position in _page_edges(page):
+            if not is_label(page[position]):
+                edge_pages.setdefault(_edge_key(page[position]), set()).add(number)
+    running = {key for key, numbers in edge_pages.items() if len(numbers) > 1}
+
+    for number, page in enumerate(pages):
+        # Deleting from the end keeps the earlier positions valid
+        for position in reversed(_page_edges(page)):
+            key = _edge_key(page[position])
+            if key in running and not is_label(page[position]) and number != min(edge_pages[key]):
+                del page[position]
+                dropped["duplicate"] += 1
+
+    paragraphs = []
+    for paragraph in _paragraphs([line for page in pages for line in page + [""]]):
+        lines = [line.strip() for line in paragraph]
+        prose = [not is_label(line) and len(line.split()) >= PROSE_LINE_MIN_WORDS for line in lines]
+        if sum(len(line.split()) for line, is_prose in zip(lines, prose) if is_prose) >= PROMPT_PROSE_MIN_WORDS:
+            # The last line of a paragraph is usually a short remainder of the sentence above it
+            if len(lines) > 1 and prose[-2] and not is_label(lines[-1]):
+                prose[-1] = True
+            dropped["prose"] += sum(prose)
+            lines = [line for line, is_prose in zip(lines, prose) if not is_prose]
+        if lines:
+            paragraphs.append(lines)
+
+    # (paragraph index, line) in reading order, with the cost of each line including its newline
+    lines = [(index, line) for index, paragraph in enumerate(paragraphs) for line in paragraph]
+    costs = [count_tokens(line) + 1 for _, line in lines]
+    keep = [True] * len(lines)
+    total = sum(costs)
+    if PROMPT_TOKEN_BUDGET > 0 and total > PROMPT_TOKEN_BUDGET:
+        for labels_too in (False, True):
+            for position in reversed(range(len(lines))):
+                if total <= PROMPT_TOKEN_BUDGET:
+                    break
+                if keep[position] and (labels_too or not is_label(lines[position][1])):
+                    keep[position] = False
+                    total -= costs[position]
+                    dropped["budget"] += 1
+
+    kept = [(index, line) for (index, line), kept_line in zip(lines, keep) if kept_line]
+    parts = []
+    for position, (index, line) in enumerate(kept):
+        if position and index != kept[position - 1][0]:
+            parts.append("")
+        parts.append(line)
+    trimmed = "\n".join(parts)
+
+    report["prompt_tokens"] = count_tokens(trimmed)
+    if original_tokens:
+        report["reduction"] = round(1 - report["prompt_tokens"] / original_tokens, 4)
+    return trimmed, report
@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+
+from services import metrics
+
+# Bytes hashed at a time when the content is a file object
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(content) -> str:
+    """SHA-256 of bytes or of a (seekable) file object, which is rewound afterwards."""
+    digest = hashlib.sha256()
+    if isinstance(content, (bytes, bytearray)):
+        digest.update(content)
+    else:
+        for chunk in iter(lambda: content.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        content.seek(0)
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; callers arriving while it runs share its result.
+
+    Only concurrent calls are merged (within one server process); once the
+    computation finishes, the next call with the same key starts a new one.
+    The computation runs as its own task, so it keeps going for the other
+    callers if the one that started it is cancelled.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self.stats = {"started": 0, "coalesced": 0}
+
+    def _finished(self, key, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller was cancelled meanwhile
+            task.exception()
+
+    async def run(self, key, compute):
+        """Return the result of ``compute()``, or of the call already running for ``key``."""
+        task = self._calls.get(key)
+        if task is None:
+            self.stats["started"] += 1
+            task = asyncio.ensure_future(compute())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.stats["coalesced"] += 1
+            metrics.COALESCED_REQUESTS.labels(self.name).inc()
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,32 @@
+import json
+import re
+
+# A complete "key": value pair inside a (possibly unfinished) JSON object
+_FIELD_PATTERN = re.compile(
+    r'"((?:[^"\\]|\\.)*)"\s*:\s*("(?:[^"\\]|\\.)*"|null|true|false|-?\d+(?:\.\d+)?)\s*(?=[,}])'
+)
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class JsonFieldScanner:
+    """Picks finished field/value pairs out of a JSON object that arrives in pieces.
+
+    GPT streams the filled form token by token; every call to ``feed`` returns
+    the pairs that became complete with the new piece, each pair exactly once.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._position = 0
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        fields = []
+        for match in _FIELD_PATTERN.finditer(self.text, self._position):
+            fields.append((json.loads(f'"{match.group(1)}"'), json.loads(match.group(2))))
+            self._position = match.end()
+        return fields
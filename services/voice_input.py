@@ -0,0 +1,97 @@
+import base64
+import binascii
+import os
+import tempfile
+from typing import NamedTuple, Union, BinaryIO
+
+from dotenv import load_dotenv
+from fastapi import Request
+
+# Load environment variables
+load_dotenv()
+
+# Raw audio bodies up to this size stay in memory, larger ones spill to a temp file
+AUDIO_SPOOL_MAX_BYTES = int(os.getenv("AUDIO_SPOOL_MAX_BYTES", 4 * 1024 * 1024))
+# Whisper rejects files above 25 MB
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", 25 * 1024 * 1024))
+
+
+# File extensions Whisper uses to detect the audio format
+AUDIO_EXTENSIONS = {
+    "audio/wav": ".wav", "audio/x-wav": ".wav", "audio/wave": ".wav",
+    "audio/webm": ".webm", "audio/ogg": ".ogg", "audio/mpeg": ".mp3",
+    "audio/mp4": ".m4a", "audio/x-m4a": ".m4a", "audio/flac": ".flac",
+}
+
+
+class VoiceInputError(ValueError):
+    def __init__(self, message: str, status_code: int = 422):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class VoiceInput(NamedTuple):
+    audio: Union[bytes, BinaryIO]
+    filename: str
+    extracted_fields: str
+
+    def close(self):
+        """Release the spooled upload (temp file) once the request is done with it."""
+        if not isinstance(self.audio, (bytes, bytearray)):
+            self.audio.close()
+
+
+async def read_voice_input(request: Request, require_fields: bool = True) -> VoiceInput:
+    """Read the recording and the form fields from a /process_voice request.
+
+    Supported bodies:
+    - ``application/json`` with ``audio_base64`` and ``extracted_fields`` (original format)
+    - ``multipart/form-data`` with an ``audio`` file and an ``extracted_fields`` field
+    - raw audio (``audio/*`` or ``application/octet-stream``) with ``?extracted_fields=...``
+
+    Without ``require_fields`` (fill sessions know their fields) ``extracted_fields`` may be left out.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type == "application/json":
+        try:
+            body = await request.json()
+        except ValueError:
+            raise VoiceInputError("request body is not valid JSON") from None
+        if not isinstance(body, dict) or "audio_base64" not in body \
+                or (require_fields and "extracted_fields" not in body):
+            raise VoiceInputError("audio_base64 and extracted_fields are required")
+        try:
+            audio = base64.b64decode(body["audio_base64"], validate=True)
+        except (binascii.Error, TypeError):
+            raise VoiceInputError("audio_base64 is not valid base64") from None
+        if len(audio) > AUDIO_MAX_BYTES:
+            raise VoiceInputError("audio file too large", status_code=413)
+        return VoiceInput(audio, "audio.wav", body.get("extracted_fields", ""))
+
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        audio = form.get("audio")
+        if audio is None or isinstance(audio, str) or (require_fields and "extracted_fields" not in form):
+            raise VoiceInputError("an audio file and extracted_fields are required")
+        if audio.size is not None and audio.size > AUDIO_MAX_BYTES:
+            raise VoiceInputError("audio file too large", status_code=413)
+        # The upload is already spooled by Starlette; hand its file object on as is
+        return VoiceInput(audio.file, audio.filename or "audio.wav", form.get("extracted_fields", ""))
+
+    if content_type.startswith("audio/") or content_type == "application/octet-stream":
+        extracted_fields = request.query_params.get("extracted_fields")
+        if extracted_fields is None and require_fields:
+            raise VoiceInputError("extracted_fields query parameter is required")
+        spool = tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_BYTES)
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > AUDIO_MAX_BYTES:
+                spool.close()
+                raise VoiceInputError("audio file too large", status_code=413)
+            spool.write(chunk)
+        spool.seek(0)
+        return VoiceInput(spool, "audio" + AUDIO_EXTENSIONS.get(content_type, ".wav"), extracted_fields or "")
+
+    raise VoiceInputError(f"unsupported content type: {content_type or 'none'}", status_code=415)
@@ -0,0 +1,92 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from services import ai_cache, ai_client, metrics
+
+# Load environment variables
+load_dotenv()
+
+# Sessions without a new utterance for this many seconds expire
+VOICE_SESSION_TTL = int(os.getenv("VOICE_SESSION_TTL", 24 * 3600))
+
+# Prompt version of the delta prompt (part of the GPT response cache key)
+FIELD_DELTA_PROMPT_VERSION = "1"
+
+
+class FieldDeltaError(ValueError):
+    pass
+
+
+def expired_before() -> datetime:
+    """Sessions last updated before this moment are expired."""
+    return datetime.utcnow() - timedelta(seconds=VOICE_SESSION_TTL)
+
+
+def parse_field_names(extracted_fields) -> list:
+    """Field names from the /process_form result (JSON object or list) or a plain list of names.
+
+    Accepts the decoded value or its JSON text; anything else is read as one name per line or comma.
+    """
+    if isinstance(extracted_fields, str):
+        try:
+            extracted_fields = json.loads(extracted_fields)
+        except ValueError:
+            separator = "\n" if "\n" in extracted_fields else ","
+            extracted_fields = extracted_fields.split(separator)
+    if isinstance(extracted_fields, dict):
+        names = list(extracted_fields.keys())
+    elif isinstance(extracted_fields, list):
+        names = [item.get("name") or item.get("label") if isinstance(item, dict) else item
+                 for item in extracted_fields]
+    else:
+        names = []
+    # Keep the order of the form, drop empty entries and duplicates
+    return list(dict.fromkeys(str(name).strip() for name in names if name is not None and str(name).strip()))
+
+
+def delta_messages(fields: list, transcript: str) -> list:
+    """Prompt for one utterance: the field names and the new transcript only, never earlier values."""
+    return [
+        {"role": "system", "content": (
+            f"Form fields: {json.dumps(fields, ensure_ascii=False)}. "
+            "A technician dictates values for some of these fields. Reply with a JSON object that contains "
+            "only the fields this dictation sets or corrects, using the exact field names. Reply {} if none.")},
+        {"role": "user", "content": transcript}
+    ]
+
+
+def parse_delta(content: str, fields: list) -> dict:
+    """The JSON object in GPT's answer, restricted to known fields (matched case-insensitively)."""
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end < start:
+        raise FieldDeltaError("GPT answer contains no JSON object")
+    try:
+        answer = json.loads(content[start:end + 1])
+    except ValueError as e:
+        raise FieldDeltaError(f"GPT answer is not valid JSON: {e}") from None
+    names = {name.lower(): name for name in fields}
+    delta = {}
+    for name, value in answer.items():
+        field = names.get(str(name).strip().lower())
+        if field is not None and value is not None:
+            delta[field] = value
+    return delta
+
+
+async def transcribe_delta(fields: list, audio, filename: str, bypass_cache: bool = False):
+    """Transcribe one utterance and ask GPT which fields it fills; returns ``(transcript, delta)``."""
+    with metrics.track("whisper"):
+        response = await ai_client.transcribe(audio, filename=filename)
+    transcript = response['text']
+
+    with metrics.track("gpt_field_delta"):
+        openai_response = await ai_cache.chat_completion(
+            model="gpt-4-turbo",
+            messages=delta_messages(fields, transcript),
+            prompt_version=FIELD_DELTA_PROMPT_VERSION,
+            bypass=bypass_cache
+        )
+    return transcript, parse_delta(openai_response['choices'][0]['message']['content'], fields)